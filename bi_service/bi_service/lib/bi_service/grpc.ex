@@ -13,7 +13,7 @@ defmodule BiService.Grpc do
 
   @spec get_books(GRPC.Channel.t()) :: {:ok, Messages.BookList.t()} | {:error, any()}
   def get_books(channel) do
-    request = %Messages.Empty{}
+    request = %Messages.ListBooksRequest{}
     Messages.BookService.Stub.list_books(channel, request)
   end
 
@@ -28,7 +28,7 @@ defmodule BiService.Router do
 
   @spec teste(GRPC.Channel.t()) :: {:ok, Messages.BookList.t()} | {:error, any()}
   def teste(channel) do
-    with request <- %Messages.Empty{},
+    with request <- %Messages.ListBooksRequest{},
          {:ok, response} <- Messages.BookService.Stub.list_books(channel, request) do
       {:ok, response}
     end
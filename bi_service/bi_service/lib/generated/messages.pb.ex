@@ -4,6 +4,18 @@ defmodule Messages.Empty do
   use Protobuf, full_name: "messages.Empty", protoc_gen_elixir_version: "0.16.0", syntax: :proto3
 end
 
+defmodule Messages.ListBooksRequest do
+  @moduledoc false
+
+  use Protobuf,
+    full_name: "messages.ListBooksRequest",
+    protoc_gen_elixir_version: "0.16.0",
+    syntax: :proto3
+
+  field :page_size, 1, type: :int32, json_name: "pageSize"
+  field :page_token, 2, type: :string, json_name: "pageToken"
+end
+
 defmodule Messages.SearchRequest do
   @moduledoc false
 
@@ -40,6 +52,7 @@ defmodule Messages.BookList do
     syntax: :proto3
 
   field :books, 1, repeated: true, type: Messages.Book
+  field :next_page_token, 2, type: :string, json_name: "nextPageToken"
 end
 
 defmodule Messages.Author do
@@ -66,7 +79,9 @@ defmodule Messages.BookService.Service do
 
   use GRPC.Service, name: "messages.BookService", protoc_gen_elixir_version: "0.16.0"
 
-  rpc :ListBooks, Messages.Empty, Messages.BookList
+  rpc :ListBooks, Messages.ListBooksRequest, Messages.BookList
+
+  rpc :StreamBooks, Messages.ListBooksRequest, stream(Messages.BookList)
 
   rpc :SearchBooksByName, Messages.SearchRequest, Messages.BookList
 
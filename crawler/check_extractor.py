@@ -0,0 +1,59 @@
+import glob
+import os
+import sys
+import time
+
+import crawler
+import http_cache
+
+
+def load_pages(paths):
+    if not paths:
+        paths = sorted(glob.glob(os.path.join(http_cache.CACHE_DIR, "*", "*.html")))
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as handle:
+            yield path, handle.read()
+
+
+def time_parser(html, parser):
+    started = time.perf_counter()
+    result = crawler.parse_book_page(html, parser=parser)
+    return result, time.perf_counter() - started
+
+
+def main(paths):
+    if crawler.lxml_html is None:
+        print("lxml is not installed; nothing to compare")
+        return 1
+    pages = 0
+    mismatches = 0
+    totals = {"bs4": 0.0, "lxml": 0.0}
+    for path, html in load_pages(paths):
+        expected, bs4_seconds = time_parser(html, "bs4")
+        actual, lxml_seconds = time_parser(html, "lxml")
+        totals["bs4"] += bs4_seconds
+        totals["lxml"] += lxml_seconds
+        pages += 1
+        if expected != actual:
+            mismatches += 1
+            print(f"Mismatch in {path}")
+            print(f"  bs4:  {expected}")
+            print(f"  lxml: {actual}")
+        print(
+            f"{path}: bs4 {bs4_seconds * 1000:.2f} ms, lxml {lxml_seconds * 1000:.2f} ms"
+        )
+
+    if not pages:
+        print("No saved pages found")
+        return 1
+    bs4_ms = totals["bs4"] * 1000 / pages
+    lxml_ms = totals["lxml"] * 1000 / pages
+    print(
+        f"Checked {pages} pages, {mismatches} mismatches. "
+        f"bs4 {bs4_ms:.2f} ms/page, lxml {lxml_ms:.2f} ms/page"
+    )
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
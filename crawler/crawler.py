@@ -1,23 +1,81 @@
 import csv
 import datetime
+import glob
+import json
 import os
 import re
-import ssl
+import threading
 import time
 import unicodedata
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
 import boto3
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-import pika
+
+try:
+    from lxml import etree as lxml_etree
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_etree = None
+    lxml_html = None
+
+import http_cache
+from frontier import Frontier
+from rabbit_publisher import RabbitPublisher
+from rate_limit import HostRateLimiter, backoff_delay, parse_retry_after
+from run_metrics import RunMetrics
+from s3_stream import MultipartUpload
 
 DEFAULT_URL = "https://freecomputerbooks.com/compscArtificialIntelligenceBooks.html"
+CATEGORY_URLS = [DEFAULT_URL]
 OUTPUT_CSV = f"books_{datetime.date.today().isoformat()}.csv"
+DELTA_CSV = f"books_{datetime.date.today().isoformat()}_delta.csv"
 LIMIT_BOOKS = 0
 
+INCREMENTAL_MODE = False
+STATE_PATH = "crawl_state.json"
+STATE_MAX_AGE_DAYS = 7
+
+FRONTIER_PATH = "books.frontier.sqlite3"
+FRONTIER_BATCH_SIZE = 256
+FRONTIER_MAX_ATTEMPTS = 3
+
+RUN_REPORT_PATH = f"books_{datetime.date.today().isoformat()}.run.json"
+PROMETHEUS_TEXTFILE = "crawler.prom"
+
 
 SLEEP_SECONDS = 0
 
+MAX_WORKERS = 16
+MAX_PER_HOST = 8
+
+HTTP_CACHE_ENABLED = True
+
+RATE_LIMIT_ENABLED = True
+FETCH_MAX_ATTEMPTS = 5
+RETRY_STATUSES = {403, 429, 500, 502, 503, 504}
+
+DETAIL_PARSER = "lxml"
+MAX_LABEL_CHARS = 256
+
+METRICS = RunMetrics()
+_LXML_PARSERS = threading.local()
+
+_S3_CLIENT = None
+_S3_CLIENT_LOCK = threading.Lock()
+
+_RABBIT_PUBLISHER = None
+_RABBIT_PUBLISHER_LOCK = threading.Lock()
+
+_HOST_SEMAPHORES = {}
+_HOST_SEMAPHORES_LOCK = threading.Lock()
+
+_HOST_LIMITERS = {}
+_HOST_LIMITERS_LOCK = threading.Lock()
+
 
 FIELDNAMES = [
     "title",
@@ -42,6 +100,11 @@ LABEL_MAP = {
     "isbn 13": "isbn_13",
 }
 
+NEXT_PAGE_LABELS = {"next", "next >", "next >>", "next \u00bb", "next page", "\u00bb"}
+
+LXML_SPAN_TAGS = {"dt", "dd", "li", "b", "strong", "p", "span", "div", "h1"}
+LXML_SKIP_TEXT_TAGS = {"script", "style", "template"}
+
 
 def normalize_text(text):
     return re.sub(r"\s+", " ", text or "").strip()
@@ -55,6 +118,34 @@ def normalize_label(text):
     return ascii_text.lower()
 
 
+def build_session(pool_size=MAX_WORKERS):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def host_semaphore(url):
+    host = urlparse(url).netloc
+    with _HOST_SEMAPHORES_LOCK:
+        semaphore = _HOST_SEMAPHORES.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(MAX_PER_HOST)
+            _HOST_SEMAPHORES[host] = semaphore
+    return semaphore
+
+
+def host_limiter(url):
+    host = urlparse(url).netloc
+    with _HOST_LIMITERS_LOCK:
+        limiter = _HOST_LIMITERS.get(host)
+        if limiter is None:
+            limiter = HostRateLimiter(burst=MAX_PER_HOST)
+            _HOST_LIMITERS[host] = limiter
+    return limiter
+
+
 def fetch_html(session, url):
     headers = {
         "User-Agent": (
@@ -68,12 +159,67 @@ def fetch_html(session, url):
         "Pragma": "no-cache",
         "DNT": "1",
     }
-    for attempt in range(2):
-        response = session.get(url, headers=headers, timeout=30)
-        if response.status_code != 403 or attempt == 1:
+    entry = http_cache.load_entry(url) if HTTP_CACHE_ENABLED else None
+    if entry:
+        headers.update(http_cache.conditional_headers(entry))
+    limiter = host_limiter(url) if RATE_LIMIT_ENABLED else None
+    fetch_started = time.perf_counter()
+    for attempt in range(FETCH_MAX_ATTEMPTS):
+        if limiter:
+            limiter.acquire()
+        try:
+            with host_semaphore(url):
+                started = time.monotonic()
+                response = session.get(url, headers=headers, timeout=30)
+                latency = time.monotonic() - started
+        except requests.RequestException as exc:
+            record_fetch(url, fetch_started, 0, None, attempt, error=str(exc))
+            raise
+        if (
+            response.status_code in RETRY_STATUSES
+            and attempt < FETCH_MAX_ATTEMPTS - 1
+        ):
+            delay = parse_retry_after(response.headers.get("Retry-After"))
+            if delay is None:
+                delay = backoff_delay(attempt)
+            print(f"Got {response.status_code} for {url}; retrying in {delay:.1f}s")
+            METRICS.increment("fetch_retries")
+            if limiter:
+                limiter.on_throttle(delay)
+            else:
+                time.sleep(delay)
+            continue
+        if limiter:
+            limiter.on_success(latency)
+        if response.status_code == 304 and entry:
+            http_cache.touch_entry(url, entry)
+            record_fetch(url, fetch_started, 0, 304, attempt, cached=True)
+            return entry["body"]
+        try:
             response.raise_for_status()
-            return response.text
-        time.sleep(1.0)
+        except requests.HTTPError as exc:
+            record_fetch(url, fetch_started, 0, response.status_code, attempt, error=str(exc))
+            raise
+        if HTTP_CACHE_ENABLED:
+            http_cache.store_entry(url, response)
+        record_fetch(url, fetch_started, len(response.content), response.status_code, attempt)
+        return response.text
+
+
+def record_fetch(url, started, nbytes, status, attempt, cached=False, error=None):
+    seconds = time.perf_counter() - started
+    METRICS.add("fetch", seconds, nbytes=nbytes, error=error is not None)
+    if cached:
+        METRICS.increment("fetch_not_modified")
+    METRICS.record_url(
+        url,
+        status=status,
+        fetch_ms=round(seconds * 1000, 3),
+        bytes=nbytes,
+        attempts=attempt + 1,
+        cached=cached,
+        error=error,
+    )
 
 
 def extract_product_links(soup, base_url):
@@ -101,6 +247,49 @@ def collect_product_links(session, start_url, max_books=None):
     return sorted_links
 
 
+def extract_next_page(soup, base_url):
+    anchor = soup.find(["a", "link"], rel="next", href=True)
+    if anchor is None:
+        for candidate in soup.select("a[href]"):
+            label = normalize_text(candidate.get_text(" ", strip=True)).lower()
+            if label in NEXT_PAGE_LABELS:
+                anchor = candidate
+                break
+    if anchor is None:
+        return None
+    href = anchor.get("href", "").split("#")[0]
+    if not href:
+        return None
+    next_url = urljoin(base_url, href)
+    if urlparse(next_url).netloc != urlparse(base_url).netloc or next_url == base_url:
+        return None
+    return next_url
+
+
+def discover_links(session, frontier, category_urls, max_books=None):
+    frontier.add(category_urls, "category")
+    while True:
+        pending = frontier.pending("category", FRONTIER_BATCH_SIZE)
+        if not pending:
+            return
+        for url in pending:
+            try:
+                html = fetch_html(session, url)
+            except requests.RequestException as exc:
+                print(f"Failed category {url}: {exc}")
+                frontier.mark_failed(url, str(exc))
+                continue
+            soup = BeautifulSoup(html, "html.parser")
+            next_page = extract_next_page(soup, url)
+            if next_page:
+                frontier.add([next_page], "category")
+            links = sorted(extract_product_links(soup, url))
+            if max_books:
+                links = links[: max(0, max_books - frontier.count("book"))]
+            frontier.add(links, "book")
+            frontier.mark_done(url)
+
+
 def extract_detail_pairs(soup):
     details = {}
 
@@ -143,8 +332,130 @@ def extract_detail_pairs(soup):
     return details
 
 
-def extract_book_details(session, url):
-    html = fetch_html(session, url)
+def strip_label_prefix(text, label):
+    if label and text[: len(label)].lower() == label.lower():
+        text = text[len(label) :].lstrip()
+        if text.startswith(":"):
+            text = text[1:].lstrip()
+    return text.strip()
+
+
+def lxml_parser():
+    parser = getattr(_LXML_PARSERS, "parser", None)
+    if parser is None:
+        parser = lxml_html.HTMLParser(encoding="utf-8")
+        _LXML_PARSERS.parser = parser
+    return parser
+
+
+def parse_book_page_lxml(html):
+    try:
+        root = lxml_html.document_fromstring(html.encode("utf-8"), parser=lxml_parser())
+    except (lxml_etree.ParserError, ValueError):
+        return "", {}
+
+    tokens = []
+    spans = {}
+    dts = []
+    lis = []
+    blocks = []
+    title_tag = None
+    bold_of = {}
+    open_lis = []
+
+    for event, element in lxml_etree.iterwalk(root, events=("start", "end")):
+        tag = element.tag
+        if not isinstance(tag, str):
+            if event == "end" and element.tail:
+                text = element.tail.strip()
+                if text:
+                    tokens.append(text)
+            continue
+        if event == "start":
+            if tag in LXML_SPAN_TAGS:
+                spans[element] = [len(tokens), None]
+                if tag == "dt":
+                    dts.append(element)
+                elif tag == "li":
+                    lis.append(element)
+                    open_lis.append(element)
+                elif tag in ("b", "strong"):
+                    for li in open_lis:
+                        bold_of[li] = element
+                    open_lis.clear()
+                elif tag == "h1":
+                    if title_tag is None:
+                        title_tag = element
+                elif tag != "dd":
+                    blocks.append(element)
+            if element.text and tag not in LXML_SKIP_TEXT_TAGS:
+                text = element.text.strip()
+                if text:
+                    tokens.append(text)
+        else:
+            if tag in LXML_SPAN_TAGS:
+                spans[element][1] = len(tokens)
+                if tag == "li" and open_lis and open_lis[-1] is element:
+                    open_lis.pop()
+            if element.tail:
+                text = element.tail.strip()
+                if text:
+                    tokens.append(text)
+
+    next_colon = [len(tokens)] * (len(tokens) + 1)
+    for index in range(len(tokens) - 1, -1, -1):
+        next_colon[index] = index if ":" in tokens[index] else next_colon[index + 1]
+
+    def span_text(element):
+        start, end = spans[element]
+        return normalize_text(" ".join(tokens[start:end]))
+
+    title = span_text(title_tag) if title_tag is not None else ""
+    details = {}
+
+    for dt in dts:
+        dd = next(dt.itersiblings("dd"), None)
+        if dd is None:
+            continue
+        label = normalize_label(span_text(dt))
+        if label in LABEL_MAP:
+            details[LABEL_MAP[label]] = span_text(dd)
+
+    for li in lis:
+        bold = bold_of.get(li)
+        if bold is None:
+            continue
+        raw_label = span_text(bold).rstrip(":")
+        key = LABEL_MAP.get(normalize_label(raw_label))
+        if not key or key in details:
+            continue
+        value = strip_label_prefix(span_text(li), raw_label)
+        if value:
+            details[key] = value
+
+    for element in blocks:
+        start, end = spans[element]
+        colon = next_colon[start]
+        if colon >= end:
+            continue
+        label_parts = []
+        label_chars = 0
+        for index in range(start, colon):
+            label_parts.append(tokens[index])
+            label_chars += len(tokens[index]) + 1
+            if label_chars > MAX_LABEL_CHARS:
+                break
+        if label_chars > MAX_LABEL_CHARS:
+            continue
+        label_parts.append(tokens[colon].split(":", 1)[0])
+        key = LABEL_MAP.get(normalize_label(" ".join(label_parts)))
+        if key and key not in details:
+            details[key] = normalize_text(span_text(element).split(":", 1)[1])
+
+    return title, details
+
+
+def parse_book_page_bs4(html):
     soup = BeautifulSoup(html, "html.parser")
 
     title = ""
@@ -153,7 +464,23 @@ def extract_book_details(session, url):
     if title_tag:
         title = normalize_text(title_tag.get_text(" ", strip=True))
 
-    details = extract_detail_pairs(soup)
+    return title, extract_detail_pairs(soup)
+
+
+def parse_book_page(html, parser=None):
+    parser = parser or DETAIL_PARSER
+    if parser == "lxml" and lxml_html is not None:
+        return parse_book_page_lxml(html)
+    return parse_book_page_bs4(html)
+
+
+def extract_book_details(session, url):
+    html = fetch_html(session, url)
+    started = time.perf_counter()
+    title, details = parse_book_page(html)
+    elapsed = time.perf_counter() - started
+    METRICS.add("parse", elapsed, nbytes=len(html))
+    METRICS.record_url(url, parse_ms=round(elapsed * 1000, 3))
 
     book = {
         "title": title,
@@ -166,11 +493,212 @@ def extract_book_details(session, url):
     return book
 
 
+def fetch_book(session, link):
+    try:
+        book = extract_book_details(session, link)
+    except requests.RequestException as exc:
+        return None, exc
+    time.sleep(SLEEP_SECONDS)
+    return book, None
+
+
+def crawl_details(session, product_links, max_workers=MAX_WORKERS):
+    max_workers = max(1, max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        links = iter(enumerate(product_links, start=1))
+        for index, link in links:
+            pending.append((index, link, executor.submit(fetch_book, session, link)))
+            if len(pending) >= max_workers * 2:
+                break
+        while pending:
+            index, link, future = pending.popleft()
+            book, exc = future.result()
+            for next_index, next_link in links:
+                pending.append(
+                    (next_index, next_link, executor.submit(fetch_book, session, next_link))
+                )
+                break
+            yield index, link, book, exc
+
+
+class CsvStreamWriter:
+    def __init__(self, path, upload=None):
+        self.path = path
+        self.upload = upload
+        self.count = 0
+        self.handle = open(path, "w", newline="", encoding="utf-8")
+        try:
+            self.writer = csv.DictWriter(self, fieldnames=FIELDNAMES)
+            self.writer.writeheader()
+            self.handle.flush()
+        except BaseException:
+            self.handle.close()
+            raise
+
+    def write(self, text):
+        self.handle.write(text)
+        data = text.encode("utf-8")
+        METRICS.add("csv_write", 0.0, nbytes=len(data), count=0)
+        if self.upload is not None:
+            self.upload.write(data)
+
+    def write_row(self, row):
+        started = time.perf_counter()
+        self.writer.writerow(row)
+        self.handle.flush()
+        self.count += 1
+        METRICS.add("csv_write", time.perf_counter() - started)
+
+    def close(self):
+        self.handle.close()
+        if self.upload is not None:
+            started = time.perf_counter()
+            try:
+                self.upload.complete()
+            finally:
+                self.record_upload(time.perf_counter() - started)
+
+    def abort(self):
+        self.handle.close()
+        if self.upload is not None:
+            try:
+                self.upload.abort()
+            finally:
+                METRICS.add("upload", 0.0, error=True)
+
+    def record_upload(self, complete_seconds):
+        METRICS.add(
+            "upload",
+            self.upload.parts_seconds + complete_seconds,
+            nbytes=self.upload.bytes_sent,
+            count=max(1, self.upload.next_part_number - 1),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
 def write_csv(path, rows):
-    with open(path, "w", newline="", encoding="utf-8") as handle:
-        writer = csv.DictWriter(handle, fieldnames=FIELDNAMES)
-        writer.writeheader()
-        writer.writerows(rows)
+    with CsvStreamWriter(path) as writer:
+        for row in rows:
+            writer.write_row(row)
+
+
+def open_csv_stream(path, bucket, object_key):
+    upload = MultipartUpload(get_s3_client(), bucket, object_key)
+    try:
+        return CsvStreamWriter(path, upload=upload)
+    except BaseException:
+        upload.abort()
+        raise
+
+
+def row_identity(row):
+    for field in ("isbn_13", "isbn_10"):
+        value = (row.get(field) or "").strip()
+        if value and value.upper() != "N/A":
+            return f"{field}:{value}"
+    return f"title:{normalize_text(row.get('title', '')).lower()}"
+
+
+def find_previous_csv(current_path=OUTPUT_CSV):
+    candidates = [
+        path
+        for path in glob.glob("books_*.csv")
+        if not path.endswith("_delta.csv")
+        and os.path.abspath(path) != os.path.abspath(current_path)
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+
+def load_crawl_state(path=STATE_PATH):
+    state = {"urls": {}, "known": {}}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as handle:
+            state["urls"] = json.load(handle).get("urls", {})
+    else:
+        previous_csv = find_previous_csv()
+        if previous_csv:
+            with open(previous_csv, "r", encoding="utf-8", newline="") as handle:
+                for row in csv.DictReader(handle):
+                    state["known"][row_identity(row)] = row
+            print(f"Seeded {len(state['known'])} known books from {previous_csv}")
+    for entry in state["urls"].values():
+        row = entry.get("row")
+        if row:
+            state["known"][row_identity(row)] = row
+    return state
+
+
+def save_crawl_state(state, path=STATE_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump({"urls": state["urls"]}, handle, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def is_stale(state, link, now, max_age_days=STATE_MAX_AGE_DAYS):
+    entry = state["urls"].get(link)
+    if not entry:
+        return True
+    return now - entry.get("fetched_at", 0) > max_age_days * 86400
+
+
+def crawl_pending_books(session, frontier, state=None):
+    total = frontier.count("book")
+    done = frontier.count("book", "done")
+    now = time.time()
+    while True:
+        batch = frontier.pending("book", FRONTIER_BATCH_SIZE)
+        if not batch:
+            return
+        links = []
+        for link in batch:
+            if state is not None and not is_stale(state, link, now):
+                entry = state["urls"][link]
+                frontier.mark_done(link, entry["row"], fetched_at=entry["fetched_at"])
+                done += 1
+            else:
+                links.append(link)
+        for _, link, book, exc in crawl_details(session, links):
+            done += 1
+            if exc is not None:
+                print(f"[{done}/{total}] Failed {link}: {exc}")
+                frontier.mark_failed(link, str(exc))
+                continue
+            yield link, book
+
+
+def crawl_incremental(session, frontier, state, delta_writer):
+    for _, row, _ in frontier.rows(changed_only=True):
+        delta_writer.write_row(row)
+    now = time.time()
+    for link, book in crawl_pending_books(session, frontier, state):
+        changed = bool(book) and state["known"].get(row_identity(book)) != book
+        frontier.mark_done(link, book, changed=changed, fetched_at=now)
+        if changed:
+            delta_writer.write_row(book)
+        if book:
+            state["known"][row_identity(book)] = book
+
+
+def crawl_full(session, frontier, writer):
+    for _, row, _ in frontier.rows():
+        writer.write_row(row)
+    for link, book in crawl_pending_books(session, frontier):
+        frontier.mark_done(link, book)
+        if book:
+            writer.write_row(book)
 
 
 def load_env_file():
@@ -198,85 +726,149 @@ def get_env(name, required=True, default=None):
     return value
 
 
-def upload_to_supabase_bucket(path, bucket, object_key):
-
-
-    load_env_file()
-    s3_endpoint = get_env("S3_ENDPOINT")
-    s3_region = get_env("S3_REGION")
-    s3_access_key = get_env("S3_ACCESS_KEY")
-    s3_secret_key = get_env("S3_SECRET_KEY")
-
-    client = boto3.client(
-        "s3",
-        region_name=s3_region,
-        endpoint_url=s3_endpoint,
-        aws_access_key_id=s3_access_key,
-        aws_secret_access_key=s3_secret_key,
-    )
-    client.upload_file(path, bucket, object_key)
-
-
-def notify_rabbitmq(filename):
-
-    load_env_file()
-    rabbit_url = get_env("RABBIT_URL")
-    rabbit_queue = get_env("RABBIT_QUEUE")
-    reject_unauthorized = get_env(
-        "RABBIT_REJECT_UNAUTHORIZED", required=False, default="false"
-    )
-    verify_certs = reject_unauthorized.lower() not in {"0", "false", "no"}
-
-    params = pika.URLParameters(rabbit_url)
-    if rabbit_url.startswith("amqps://"):
-        context = ssl.create_default_context()
-        if not verify_certs:
-            context.check_hostname = False
-            context.verify_mode = ssl.CERT_NONE
-        params.ssl_options = pika.SSLOptions(context)
-
-    connection = pika.BlockingConnection(params)
-    channel = connection.channel()
-    channel.queue_declare(queue=rabbit_queue, durable=True)
-    channel.basic_publish(
-        exchange="",
-        routing_key=rabbit_queue,
-        body=filename.encode("utf-8"),
-        properties=pika.BasicProperties(delivery_mode=2),
-    )
-    channel.close()
-    connection.close()
-
-
-def main():
-    session = requests.Session()
-
-    product_links = collect_product_links(
-        session, DEFAULT_URL, max_books=LIMIT_BOOKS or None
-    )
-    if not product_links:
+def get_s3_client():
+    global _S3_CLIENT
+    with _S3_CLIENT_LOCK:
+        if _S3_CLIENT is None:
+            load_env_file()
+            _S3_CLIENT = boto3.client(
+                "s3",
+                region_name=get_env("S3_REGION"),
+                endpoint_url=get_env("S3_ENDPOINT"),
+                aws_access_key_id=get_env("S3_ACCESS_KEY"),
+                aws_secret_access_key=get_env("S3_SECRET_KEY"),
+            )
+    return _S3_CLIENT
+
+
+def get_rabbit_publisher():
+    global _RABBIT_PUBLISHER
+    with _RABBIT_PUBLISHER_LOCK:
+        if _RABBIT_PUBLISHER is None:
+            load_env_file()
+            rabbit_url = get_env("RABBIT_URL")
+            rabbit_queue = get_env("RABBIT_QUEUE")
+            reject_unauthorized = get_env(
+                "RABBIT_REJECT_UNAUTHORIZED", required=False, default="false"
+            )
+            verify_certs = reject_unauthorized.lower() not in {"0", "false", "no"}
+            _RABBIT_PUBLISHER = RabbitPublisher(
+                rabbit_url, rabbit_queue, verify_certs=verify_certs
+            )
+    return _RABBIT_PUBLISHER
+
+
+def close_rabbit_publisher():
+    global _RABBIT_PUBLISHER
+    with _RABBIT_PUBLISHER_LOCK:
+        publisher = _RABBIT_PUBLISHER
+        _RABBIT_PUBLISHER = None
+    if publisher is not None:
+        publisher.close()
+
+
+def notify_rabbitmq(filename, flush=True):
+    publisher = get_rabbit_publisher()
+    publisher.publish(filename)
+    if flush:
+        publisher.flush()
+
+
+def run_crawl():
+    session = build_session()
+    if HTTP_CACHE_ENABLED:
+        pruned = http_cache.prune_cache()
+        if pruned:
+            print(f"Evicted {pruned} entries from {http_cache.CACHE_DIR}")
+
+    frontier = Frontier(FRONTIER_PATH)
+    requeued = frontier.requeue_failed(FRONTIER_MAX_ATTEMPTS)
+    done = frontier.count("book", "done")
+    if done or requeued:
+        print(f"Resuming crawl from {FRONTIER_PATH}: {done} done, {requeued} retried")
+    with METRICS.stage("discover"):
+        discover_links(session, frontier, CATEGORY_URLS, max_books=LIMIT_BOOKS or None)
+    METRICS.increment("books_discovered", frontier.count("book"))
+    if not frontier.count("book"):
         print("No product links found. Check the category URL or selectors.")
+        frontier.close()
         return
 
-    rows = []
-    for index, link in enumerate(product_links, start=1):
-        try:
-            book = extract_book_details(session, link)
-            if book:
-                rows.append(book)
-            time.sleep(SLEEP_SECONDS)
-        except requests.RequestException as exc:
-            print(f"[{index}/{len(product_links)}] Failed {link}: {exc}")
-
-    write_csv(OUTPUT_CSV, rows)
-    print(f"Saved {len(rows)} books to {OUTPUT_CSV}")
     load_env_file()
     s3_bucket = get_env("S3_BUCKET")
     s3_object_key = get_env("S3_OBJECT_KEY", required=False, default=OUTPUT_CSV)
-    upload_to_supabase_bucket(OUTPUT_CSV, s3_bucket, s3_object_key)
+
+    if INCREMENTAL_MODE:
+        state = load_crawl_state()
+        previous = set(state["known"])
+        with open_csv_stream(DELTA_CSV, s3_bucket, DELTA_CSV) as delta_writer:
+            crawl_incremental(session, frontier, state, delta_writer)
+        print(f"Saved {delta_writer.count} new or changed books to {DELTA_CSV}")
+        print(f"Uploaded {DELTA_CSV} to bucket {s3_bucket} as {DELTA_CSV}")
+        current = set()
+        urls = {}
+        with open_csv_stream(OUTPUT_CSV, s3_bucket, s3_object_key) as writer:
+            for link, row, fetched_at in frontier.rows():
+                writer.write_row(row)
+                urls[link] = {"fetched_at": fetched_at, "row": row}
+                current.add(row_identity(row))
+        state["urls"] = urls
+        save_crawl_state(state)
+        removed = len(previous - current)
+        METRICS.increment("books_removed", removed)
+        if removed:
+            print(f"{removed} books were removed since the last crawl")
+        notify_key = s3_object_key if delta_writer.count or removed else None
+    else:
+        with open_csv_stream(OUTPUT_CSV, s3_bucket, s3_object_key) as writer:
+            crawl_full(session, frontier, writer)
+        notify_key = s3_object_key
+    frontier.discard()
+
+    parse_stats = METRICS.report()["stages"].get("parse")
+    if parse_stats:
+        parse_ms = parse_stats["seconds"] * 1000 / parse_stats["count"]
+        print(
+            f"Parsed {parse_stats['count']} pages with {DETAIL_PARSER} "
+            f"({parse_ms:.2f} ms/page)"
+        )
+    METRICS.increment("rows_written", writer.count)
+    print(f"Saved {writer.count} books to {OUTPUT_CSV}")
     print(f"Uploaded {OUTPUT_CSV} to bucket {s3_bucket} as {s3_object_key}")
-    notify_rabbitmq(s3_object_key)
-    print(f"Notified RabbitMQ with filename {s3_object_key}")
+
+    if notify_key is None:
+        print(
+            "No new, changed or removed books since the last crawl, "
+            "skipping RabbitMQ notification"
+        )
+        return
+    try:
+        with METRICS.stage("notify"):
+            notify_rabbitmq(notify_key)
+    finally:
+        close_rabbit_publisher()
+    print(f"Notified RabbitMQ with filename {notify_key}")
+
+
+def write_run_report():
+    try:
+        METRICS.write_json(RUN_REPORT_PATH)
+        METRICS.write_prometheus(PROMETHEUS_TEXTFILE)
+    except OSError as exc:
+        print(f"Failed to write run report: {exc}")
+        return
+    print(f"Wrote run report to {RUN_REPORT_PATH} and {PROMETHEUS_TEXTFILE}")
+
+
+def main():
+    METRICS.reset()
+    status = "failed"
+    try:
+        run_crawl()
+        status = "ok"
+    finally:
+        METRICS.finish(status)
+        write_run_report()
 
 
 if __name__ == "__main__":
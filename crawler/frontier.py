@@ -0,0 +1,108 @@
+import json
+import os
+import sqlite3
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    fetched_at REAL,
+    changed INTEGER NOT NULL DEFAULT 0,
+    row TEXT
+);
+CREATE INDEX IF NOT EXISTS frontier_kind_status ON frontier (kind, status, seq);
+"""
+
+
+class Frontier:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def add(self, urls, kind):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO frontier (url, kind) VALUES (?, ?)",
+                ((url, kind) for url in urls),
+            )
+
+    def pending(self, kind, limit):
+        cur = self.conn.execute(
+            "SELECT url FROM frontier WHERE kind = ? AND status = 'pending' "
+            "ORDER BY seq LIMIT ?",
+            (kind, limit),
+        )
+        return [url for (url,) in cur.fetchall()]
+
+    def count(self, kind, status=None):
+        if status is None:
+            cur = self.conn.execute(
+                "SELECT COUNT(*) FROM frontier WHERE kind = ?", (kind,)
+            )
+        else:
+            cur = self.conn.execute(
+                "SELECT COUNT(*) FROM frontier WHERE kind = ? AND status = ?",
+                (kind, status),
+            )
+        return cur.fetchone()[0]
+
+    def mark_done(self, url, row=None, changed=False, fetched_at=None):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE frontier SET status = 'done', error = NULL, fetched_at = ?, "
+                "changed = ?, row = ? WHERE url = ?",
+                (
+                    fetched_at or time.time(),
+                    int(changed),
+                    json.dumps(row, ensure_ascii=False) if row else None,
+                    url,
+                ),
+            )
+
+    def mark_failed(self, url, error):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE frontier SET status = 'failed', error = ?, "
+                "attempts = attempts + 1 WHERE url = ?",
+                (error, url),
+            )
+
+    def requeue_failed(self, max_attempts):
+        with self.conn:
+            cur = self.conn.execute(
+                "UPDATE frontier SET status = 'pending' "
+                "WHERE status = 'failed' AND attempts < ?",
+                (max_attempts,),
+            )
+        return cur.rowcount
+
+    def rows(self, changed_only=False):
+        query = (
+            "SELECT url, row, fetched_at FROM frontier "
+            "WHERE kind = 'book' AND status = 'done' AND row IS NOT NULL"
+        )
+        if changed_only:
+            query += " AND changed = 1"
+        cur = self.conn.execute(query + " ORDER BY seq")
+        for url, row, fetched_at in cur:
+            yield url, json.loads(row), fetched_at
+
+    def close(self):
+        self.conn.close()
+
+    def discard(self):
+        self.conn.close()
+        for suffix in ("", "-wal", "-shm"):
+            path = self.path + suffix
+            if os.path.exists(path):
+                os.remove(path)
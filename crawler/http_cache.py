@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import time
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".http_cache")
+CACHE_MAX_AGE_SECONDS = 14 * 24 * 3600
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def cache_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def entry_paths(url, cache_dir=CACHE_DIR):
+    key = cache_key(url)
+    base = os.path.join(cache_dir, key[:2], key)
+    return base + ".json", base + ".html"
+
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(data)
+    os.replace(tmp_path, path)
+
+
+def remove_entry(url, cache_dir=CACHE_DIR):
+    for path in entry_paths(url, cache_dir):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def load_entry(url, cache_dir=CACHE_DIR, max_age=CACHE_MAX_AGE_SECONDS):
+    meta_path, body_path = entry_paths(url, cache_dir)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as handle:
+            meta = json.load(handle)
+        if max_age and time.time() - meta.get("stored_at", 0) > max_age:
+            remove_entry(url, cache_dir)
+            return None
+        with open(body_path, "r", encoding="utf-8") as handle:
+            meta["body"] = handle.read()
+    except (OSError, ValueError):
+        return None
+    return meta
+
+
+def conditional_headers(entry):
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def store_entry(url, response, cache_dir=CACHE_DIR):
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return
+    meta_path, body_path = entry_paths(url, cache_dir)
+    meta = {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "stored_at": time.time(),
+    }
+    write_atomic(body_path, response.text.encode("utf-8"))
+    write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+
+def touch_entry(url, entry, cache_dir=CACHE_DIR):
+    meta_path, body_path = entry_paths(url, cache_dir)
+    meta = {key: value for key, value in entry.items() if key != "body"}
+    meta["stored_at"] = time.time()
+    try:
+        write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        os.utime(body_path)
+    except OSError:
+        pass
+
+
+def prune_cache(
+    cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE_SECONDS
+):
+    if not os.path.isdir(cache_dir):
+        return 0
+    now = time.time()
+    entries = []
+    removed = 0
+    for dirpath, _, filenames in os.walk(cache_dir):
+        for filename in filenames:
+            if not filename.endswith(".html"):
+                continue
+            body_path = os.path.join(dirpath, filename)
+            meta_path = body_path[: -len(".html")] + ".json"
+            try:
+                stat = os.stat(body_path)
+                meta_size = os.path.getsize(meta_path)
+            except OSError:
+                stat, meta_size = None, 0
+            if stat is None or (max_age and now - stat.st_mtime > max_age):
+                for path in (body_path, meta_path):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                removed += 1
+                continue
+            entries.append((stat.st_mtime, stat.st_size + meta_size, body_path, meta_path))
+
+    total = sum(size for _, size, _, _ in entries)
+    if max_bytes and total > max_bytes:
+        entries.sort()
+        for _, size, body_path, meta_path in entries:
+            if total <= max_bytes:
+                break
+            for path in (body_path, meta_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+    return removed
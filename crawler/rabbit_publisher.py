@@ -0,0 +1,122 @@
+import ssl
+import time
+from collections import deque
+from itertools import islice
+
+import pika
+from pika.exceptions import AMQPChannelError, AMQPConnectionError
+
+
+RABBIT_BATCH_SIZE = 100
+RABBIT_MAX_RETRIES = 5
+RABBIT_RETRY_SECONDS = 1.0
+
+
+class RabbitPublisher:
+    def __init__(
+        self,
+        url,
+        queue,
+        verify_certs=True,
+        batch_size=RABBIT_BATCH_SIZE,
+        max_retries=RABBIT_MAX_RETRIES,
+    ):
+        self.queue = queue
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.params = pika.URLParameters(url)
+        if url.startswith("amqps://"):
+            context = ssl.create_default_context()
+            if not verify_certs:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            self.params.ssl_options = pika.SSLOptions(context)
+        self.connection = None
+        self.channel = None
+        self.pending = deque()
+        self.returned = []
+        self.published = 0
+
+    def connect(self):
+        self.connection = pika.BlockingConnection(self.params)
+        self.channel = self.connection.channel()
+        self.channel.queue_declare(queue=self.queue, durable=True)
+        self.channel.add_on_return_callback(self.on_return)
+        self.channel.tx_select()
+
+    def on_return(self, channel, method, properties, body):
+        self.returned.append(body)
+
+    def disconnect(self):
+        connection = self.connection
+        self.connection = None
+        self.channel = None
+        if connection is not None and connection.is_open:
+            try:
+                connection.close()
+            except AMQPConnectionError:
+                pass
+
+    def ensure_connected(self):
+        if (
+            self.connection is None
+            or not self.connection.is_open
+            or self.channel is None
+            or not self.channel.is_open
+        ):
+            self.disconnect()
+            self.connect()
+
+    def publish(self, body):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.pending.append(body)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        attempt = 0
+        while self.pending:
+            batch = list(islice(self.pending, self.batch_size))
+            try:
+                self.ensure_connected()
+                self.returned.clear()
+                for body in batch:
+                    self.channel.basic_publish(
+                        exchange="",
+                        routing_key=self.queue,
+                        body=body,
+                        properties=pika.BasicProperties(delivery_mode=2),
+                        mandatory=True,
+                    )
+                # One round-trip per batch: tx.commit-ok means the broker has taken
+                # every message of the batch, a failure before it resends the batch.
+                self.channel.tx_commit()
+                self.connection.process_data_events(time_limit=0)
+                for _ in batch:
+                    self.pending.popleft()
+                self.published += len(batch) - len(self.returned)
+                if self.returned:
+                    self.pending.extendleft(reversed(self.returned))
+                    raise AMQPChannelError(f"{len(self.returned)} messages were unroutable")
+            except (AMQPConnectionError, AMQPChannelError) as exc:
+                attempt += 1
+                self.disconnect()
+                if attempt > self.max_retries:
+                    raise
+                delay = RABBIT_RETRY_SECONDS * (2 ** (attempt - 1))
+                print(f"RabbitMQ publish failed ({exc}); reconnecting in {delay:.1f}s")
+                time.sleep(delay)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.disconnect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
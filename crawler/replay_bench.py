@@ -0,0 +1,189 @@
+import argparse
+import filecmp
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+import crawler
+import http_cache
+
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".replay")
+INDEX_NAME = "index.json"
+EXPECTED_CSV = "expected.csv"
+
+
+def archive_path(archive_dir, url):
+    return os.path.join(archive_dir, http_cache.cache_key(url) + ".json")
+
+
+class RecordingAdapter(HTTPAdapter):
+    def __init__(self, archive_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.archive_dir = archive_dir
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        record = {
+            "url": request.url,
+            "status": response.status_code,
+            "headers": dict(response.headers),
+            "body": response.content.decode("utf-8", errors="replace"),
+        }
+        http_cache.write_atomic(
+            archive_path(self.archive_dir, request.url),
+            json.dumps(record, ensure_ascii=False).encode("utf-8"),
+        )
+        return response
+
+
+class ReplayAdapter(HTTPAdapter):
+    def __init__(self, archive_dir, latency=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.archive_dir = archive_dir
+        self.latency = latency
+        self.bytes_served = 0
+        self.lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        try:
+            with open(archive_path(self.archive_dir, request.url), "r", encoding="utf-8") as handle:
+                record = json.load(handle)
+        except FileNotFoundError:
+            response.status_code = 404
+            response.reason = "Not Recorded"
+            response._content = b""
+            return response
+        body = record["body"].encode("utf-8")
+        headers = {
+            key: value
+            for key, value in record["headers"].items()
+            if key.lower() not in {"content-encoding", "content-length", "transfer-encoding"}
+        }
+        response.status_code = record["status"]
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = "utf-8"
+        response._content = body
+        with self.lock:
+            self.bytes_served += len(body)
+        return response
+
+
+def mount(session, adapter):
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def record(archive_dir, start_urls, max_books=None):
+    crawler.HTTP_CACHE_ENABLED = False
+    os.makedirs(archive_dir, exist_ok=True)
+    session = crawler.build_session()
+    mount(session, RecordingAdapter(archive_dir, pool_maxsize=crawler.MAX_WORKERS))
+    links = []
+    for start_url in start_urls:
+        links.extend(crawler.collect_product_links(session, start_url, max_books=max_books))
+    rows = []
+    for index, link, book, exc in crawler.crawl_details(session, links):
+        if exc is not None:
+            print(f"[{index}/{len(links)}] Failed {link}: {exc}")
+            continue
+        if book:
+            rows.append(book)
+    crawler.write_csv(os.path.join(archive_dir, EXPECTED_CSV), rows)
+    with open(os.path.join(archive_dir, INDEX_NAME), "w", encoding="utf-8") as handle:
+        json.dump({"start_urls": start_urls, "max_books": max_books}, handle)
+    print(f"Recorded {len(links) + len(start_urls)} responses to {archive_dir}")
+
+
+def replay(archive_dir, workers, parser, latency):
+    with open(os.path.join(archive_dir, INDEX_NAME), "r", encoding="utf-8") as handle:
+        index = json.load(handle)
+    crawler.HTTP_CACHE_ENABLED = False
+    crawler.RATE_LIMIT_ENABLED = False
+    crawler.SLEEP_SECONDS = 0
+    crawler.DETAIL_PARSER = parser
+    crawler.METRICS.reset()
+    session = crawler.build_session(pool_size=workers)
+    adapter = ReplayAdapter(archive_dir, latency=latency, pool_maxsize=workers)
+    mount(session, adapter)
+
+    started = time.perf_counter()
+    links = []
+    for start_url in index["start_urls"]:
+        links.extend(
+            crawler.collect_product_links(
+                session, start_url, max_books=index.get("max_books")
+            )
+        )
+    failures = 0
+    output_path = os.path.join(tempfile.mkdtemp(), EXPECTED_CSV)
+    with crawler.CsvStreamWriter(output_path) as writer:
+        for _, link, book, exc in crawler.crawl_details(session, links, max_workers=workers):
+            if exc is not None:
+                failures += 1
+                print(f"Failed {link}: {exc}")
+                continue
+            if book:
+                writer.write_row(book)
+    elapsed = time.perf_counter() - started
+
+    pages = len(links) + len(index["start_urls"])
+    parse_stats = crawler.METRICS.report()["stages"].get("parse", {"count": 0, "seconds": 0.0})
+    report = {
+        "pages": pages,
+        "rows": writer.count,
+        "failures": failures,
+        "workers": workers,
+        "parser": parser,
+        "latency_ms": latency * 1000,
+        "seconds": round(elapsed, 4),
+        "pages_per_sec": round(pages / elapsed, 2) if elapsed else 0.0,
+        "parse_ms_per_page": round(
+            parse_stats["seconds"] * 1000 / (parse_stats["count"] or 1), 3
+        ),
+        "bytes": adapter.bytes_served,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    expected_path = os.path.join(archive_dir, EXPECTED_CSV)
+    report["matches_recording"] = filecmp.cmp(expected_path, output_path, shallow=False)
+    print(json.dumps(report, indent=2))
+    return 0 if report["matches_recording"] and not failures else 1
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Record and replay crawler traffic")
+    parser.add_argument("--archive", default=ARCHIVE_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record")
+    record_parser.add_argument("urls", nargs="*", default=[crawler.DEFAULT_URL])
+    record_parser.add_argument("--max-books", type=int, default=crawler.LIMIT_BOOKS or None)
+
+    replay_parser = commands.add_parser("replay")
+    replay_parser.add_argument("--workers", type=int, default=crawler.MAX_WORKERS)
+    replay_parser.add_argument("--parser", default=crawler.DETAIL_PARSER)
+    replay_parser.add_argument("--latency-ms", type=float, default=0.0)
+
+    args = parser.parse_args(argv)
+    if args.command == "record":
+        record(args.archive, args.urls, max_books=args.max_books)
+        return 0
+    return replay(args.archive, args.workers, args.parser, args.latency_ms / 1000)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RunMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = time.time()
+            self.finished_at = None
+            self.status = "running"
+            self.stages = {}
+            self.counters = {}
+            self.urls = {}
+
+    def stage_entry(self, name):
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes": 0, "errors": 0}
+            self.stages[name] = entry
+        return entry
+
+    def add(self, stage, seconds=0.0, nbytes=0, count=1, error=False):
+        with self.lock:
+            entry = self.stage_entry(stage)
+            entry["count"] += count
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["bytes"] += nbytes
+            if error:
+                entry["errors"] += 1
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.add(name, time.perf_counter() - started, error=True)
+            raise
+        self.add(name, time.perf_counter() - started)
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_url(self, url, **fields):
+        with self.lock:
+            self.urls.setdefault(url, {}).update(fields)
+
+    def finish(self, status):
+        with self.lock:
+            self.finished_at = time.time()
+            self.status = status
+
+    def report(self):
+        with self.lock:
+            finished_at = self.finished_at or time.time()
+            return {
+                "status": self.status,
+                "started_at": self.started_at,
+                "finished_at": finished_at,
+                "duration_seconds": round(finished_at - self.started_at, 4),
+                "stages": {name: dict(entry) for name, entry in self.stages.items()},
+                "counters": dict(self.counters),
+                "urls": [dict(fields, url=url) for url, fields in self.urls.items()],
+            }
+
+    def write_json(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(self.report(), handle, indent=2)
+        os.replace(tmp_path, path)
+
+    def prometheus_text(self, prefix="crawler"):
+        report = self.report()
+        lines = [
+            f"# TYPE {prefix}_run_duration_seconds gauge",
+            f"{prefix}_run_duration_seconds {report['duration_seconds']}",
+            f"# TYPE {prefix}_run_finished_timestamp_seconds gauge",
+            f"{prefix}_run_finished_timestamp_seconds {report['finished_at']:.0f}",
+            f"# TYPE {prefix}_run_success gauge",
+            f"{prefix}_run_success {1 if report['status'] == 'ok' else 0}",
+        ]
+        stage_metrics = [
+            ("stage_seconds_total", "seconds", "counter"),
+            ("stage_max_seconds", "max_seconds", "gauge"),
+            ("stage_operations_total", "count", "counter"),
+            ("stage_bytes_total", "bytes", "counter"),
+            ("stage_errors_total", "errors", "counter"),
+        ]
+        for metric, field, kind in stage_metrics:
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name, entry in sorted(report["stages"].items()):
+                lines.append(f'{prefix}_{metric}{{stage="{name}"}} {entry[field]}')
+        for name, value in sorted(report["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix="crawler"):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            handle.write(self.prometheus_text(prefix))
+        os.replace(tmp_path, path)
@@ -0,0 +1,86 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+S3_PART_SIZE = 8 * 1024 * 1024
+S3_MAX_PENDING_PARTS = 2
+
+
+class MultipartUpload:
+    def __init__(
+        self,
+        client,
+        bucket,
+        object_key,
+        part_size=S3_PART_SIZE,
+        max_pending=S3_MAX_PENDING_PARTS,
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.object_key = object_key
+        self.part_size = part_size
+        self.max_pending = max(1, max_pending)
+        self.buffer = bytearray()
+        self.parts = []
+        self.pending = deque()
+        self.next_part_number = 1
+        self.bytes_sent = 0
+        self.parts_seconds = 0.0
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        response = client.create_multipart_upload(Bucket=bucket, Key=object_key)
+        self.upload_id = response["UploadId"]
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= self.part_size:
+            self.flush_part()
+
+    def flush_part(self):
+        body = bytes(self.buffer)
+        self.buffer.clear()
+        part_number = self.next_part_number
+        self.next_part_number += 1
+        self.pending.append(self.executor.submit(self.upload_part, part_number, body))
+        while len(self.pending) > self.max_pending:
+            self.parts.append(self.pending.popleft().result())
+
+    def upload_part(self, part_number, body):
+        started = time.perf_counter()
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.object_key,
+            PartNumber=part_number,
+            UploadId=self.upload_id,
+            Body=body,
+        )
+        self.bytes_sent += len(body)
+        self.parts_seconds += time.perf_counter() - started
+        return {"ETag": response["ETag"], "PartNumber": part_number}
+
+    def complete(self):
+        try:
+            if self.buffer or self.next_part_number == 1:
+                self.flush_part()
+            while self.pending:
+                self.parts.append(self.pending.popleft().result())
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.object_key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts},
+            )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def abort(self):
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=True)
+        self.client.abort_multipart_upload(
+            Bucket=self.bucket, Key=self.object_key, UploadId=self.upload_id
+        )
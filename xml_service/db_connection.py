@@ -1,9 +1,65 @@
 import os
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import extensions
 
 
 ENV_PATH = os.path.join(os.path.dirname(__file__), ".env")
 SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "schema.sql")
+BOOKS_KEEP_SNAPSHOTS = int(os.getenv("BOOKS_KEEP_SNAPSHOTS", "2"))
+SNAPSHOT_CHANNEL = os.getenv("SNAPSHOT_CHANNEL", "scrapdocs_snapshot")
+COPY_CHUNK_SIZE = int(os.getenv("COPY_CHUNK_SIZE", str(64 * 1024)))
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_CHECK_AFTER = float(os.getenv("DB_POOL_CHECK_AFTER", "30"))
+_POOL = None
+_POOL_LOCK = threading.Lock()
+_SCHEMA_READY = False
+_SCHEMA_LOCK = threading.Lock()
+
+BOOKS_PROJECTION_SQL = """
+INSERT INTO books (
+    doc_id, position, title, authors, publisher, language,
+    isbn_10, isbn_13, description, small_thumbnail, thumbnail,
+    title_search, authors_search
+)
+SELECT
+    s.id, b.position, b.title, b.authors, b.publisher, b.language,
+    b.isbn_10, b.isbn_13, b.description, b.small_thumbnail, b.thumbnail,
+    lower(unaccent(COALESCE(b.title, ''))), lower(unaccent(COALESCE(b.authors, '')))
+FROM scrapdocs s
+CROSS JOIN LATERAL XMLTABLE(
+    '/books/book'
+    PASSING s.doc
+    COLUMNS
+        position FOR ORDINALITY,
+        title text PATH 'title',
+        authors text PATH 'authors',
+        publisher text PATH 'publisher',
+        language text PATH 'language',
+        isbn_10 text PATH 'ISBN/isbn_10',
+        isbn_13 text PATH 'ISBN/isbn_13',
+        description text PATH 'description',
+        small_thumbnail text PATH 'thumbnails/smallThumbnail',
+        thumbnail text PATH 'thumbnails/thumbnail'
+) AS b
+WHERE s.id = %s
+"""
+
+PRUNE_BOOKS_SQL = """
+DELETE FROM books
+WHERE doc_id < %(doc_id)s
+  AND doc_id NOT IN (
+    SELECT id FROM scrapdocs
+    WHERE id <= %(doc_id)s
+    ORDER BY id DESC
+    LIMIT %(keep)s
+  )
+"""
 
 
 def load_env_file(path=ENV_PATH):
@@ -52,7 +108,143 @@ def ensure_schema(conn):
     conn.commit()
 
 
-def insert_xml_document(conn, xml_text, mapper_version=None):
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        config,
+        minconn=DB_POOL_MIN,
+        maxconn=DB_POOL_MAX,
+        timeout=DB_POOL_TIMEOUT,
+        check_after=DB_POOL_CHECK_AFTER,
+    ):
+        self.config = config
+        self.maxconn = max(1, maxconn)
+        self.timeout = timeout
+        self.check_after = check_after
+        self.condition = threading.Condition()
+        self.idle = []
+        self.size = 0
+        self.closed = False
+        for _ in range(min(max(0, minconn), self.maxconn)):
+            self.idle.append((psycopg2.connect(**config), time.monotonic()))
+            self.size += 1
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self.idle:
+                    conn, released_at = self.idle.pop()
+                    break
+                if self.size < self.maxconn:
+                    self.size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f"No database connection available after {self.timeout}s "
+                        f"({self.maxconn} in use)"
+                    )
+                self.condition.wait(remaining)
+        if conn is not None and self.healthy(conn, released_at):
+            return conn
+        if conn is not None:
+            conn.close()
+        try:
+            return psycopg2.connect(**self.config)
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+
+    def healthy(self, conn, released_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - released_at < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def release(self, conn):
+        if not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                conn.close()
+        with self.condition:
+            if conn.closed or self.closed:
+                conn.close()
+                self.size -= 1
+            else:
+                self.idle.append((conn, time.monotonic()))
+            self.condition.notify()
+
+    def stats(self):
+        with self.condition:
+            return {"size": self.size, "idle": len(self.idle), "max": self.maxconn}
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.size -= len(idle)
+            self.condition.notify_all()
+        for conn, _ in idle:
+            conn.close()
+
+
+def get_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ConnectionPool(get_db_config())
+        return _POOL
+
+
+def bootstrap_schema():
+    global _SCHEMA_READY
+    with _SCHEMA_LOCK:
+        if _SCHEMA_READY:
+            return
+        pool = get_pool()
+        conn = pool.acquire()
+        try:
+            ensure_schema(conn)
+            project_latest_snapshot(conn)
+        finally:
+            pool.release(conn)
+        _SCHEMA_READY = True
+        print(f"Database schema ready ({SCHEMA_PATH})")
+
+
+@contextmanager
+def pooled_connection():
+    if not _SCHEMA_READY:
+        bootstrap_schema()
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        pool.release(conn)
+
+
+def insert_xml_document(conn, xml_text, mapper_version=None, publish=True):
     with conn.cursor() as cur:
         cur.execute(
             "INSERT INTO scrapdocs (doc, mapper_version) "
@@ -60,5 +252,76 @@ def insert_xml_document(conn, xml_text, mapper_version=None):
             (xml_text, mapper_version),
         )
         row_id = cur.fetchone()[0]
+    if publish:
+        project_books(conn, row_id)
+        conn.commit()
+    return row_id
+
+
+def project_books(conn, doc_id):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM books WHERE doc_id = %s", (doc_id,))
+        cur.execute(BOOKS_PROJECTION_SQL, (doc_id,))
+        projected = cur.rowcount
+        cur.execute(PRUNE_BOOKS_SQL, {"doc_id": doc_id, "keep": max(1, BOOKS_KEEP_SNAPSHOTS)})
+        cur.execute("SELECT pg_notify(%s, %s)", (SNAPSHOT_CHANNEL, str(doc_id)))
+        return projected
+
+
+def project_latest_snapshot(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT s.id FROM scrapdocs s "
+            "WHERE s.id = (SELECT MAX(id) FROM scrapdocs) "
+            "AND NOT EXISTS (SELECT 1 FROM books b WHERE b.doc_id = s.id)"
+        )
+        row = cur.fetchone()
+    if row is None:
+        return None
+    count = project_books(conn, row[0])
     conn.commit()
+    print(f"Projected {count} books from snapshot {row[0]}")
+    return row[0]
+
+
+def csv_field(value):
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class CopyDocumentReader:
+    def __init__(self, handle, row_id, mapper_version=None, chunk_size=COPY_CHUNK_SIZE):
+        self.handle = handle
+        self.chunk_size = chunk_size
+        self.head = f'{row_id},"'.encode("utf-8")
+        self.tail = f'",{csv_field(mapper_version)}\n'.encode("utf-8")
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        if self.head:
+            chunk, self.head = self.head, b""
+            return chunk
+        data = self.handle.read(self.chunk_size)
+        if data:
+            self.bytes_read += len(data)
+            return data.replace(b'"', b'""')
+        chunk, self.tail = self.tail, b""
+        return chunk
+
+
+def insert_xml_file(conn, xml_path, mapper_version=None, publish=True):
+    with conn.cursor() as cur:
+        cur.execute("SELECT nextval(pg_get_serial_sequence('scrapdocs', 'id'))")
+        row_id = cur.fetchone()[0]
+        with open(xml_path, "rb") as handle:
+            cur.copy_expert(
+                "COPY scrapdocs (id, doc, mapper_version) FROM STDIN "
+                "WITH (FORMAT csv, ENCODING 'UTF8')",
+                CopyDocumentReader(handle, row_id, mapper_version),
+                size=COPY_CHUNK_SIZE,
+            )
+    if publish:
+        project_books(conn, row_id)
+        conn.commit()
     return row_id
@@ -0,0 +1,231 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from xml_processor import (
+    END_MARKER,
+    SocketReceiver,
+    build_job,
+    decode_lines,
+    enqueue_job,
+    parse_header,
+    report_ingest_failure,
+    stream_job,
+)
+
+
+INGEST_BACKLOG = int(os.getenv("INGEST_BACKLOG", "1024"))
+INGEST_MAX_CONNECTIONS = int(os.getenv("INGEST_MAX_CONNECTIONS", "4096"))
+INGEST_IDLE_TIMEOUT = float(os.getenv("INGEST_IDLE_TIMEOUT", "60"))
+INGEST_BUFFER_SIZE = int(os.getenv("INGEST_BUFFER_SIZE", str(64 * 1024)))
+INGEST_STREAM_WORKERS = int(os.getenv("INGEST_STREAM_WORKERS", "4"))
+INGEST_STREAM_QUEUE = int(os.getenv("INGEST_STREAM_QUEUE", "16"))
+INGEST_ENQUEUE_WORKERS = int(os.getenv("INGEST_ENQUEUE_WORKERS", "1"))
+STREAM_INTERRUPTED = object()
+
+
+class AsyncSocketReceiver(SocketReceiver):
+    def __init__(self, reader, idle_timeout=INGEST_IDLE_TIMEOUT, buffer_size=INGEST_BUFFER_SIZE):
+        super().__init__(None, buffer_size)
+        self.reader = reader
+        self.idle_timeout = idle_timeout
+
+    async def fill(self):
+        self.make_room()
+        data = await asyncio.wait_for(
+            self.reader.read(len(self.buffer) - self.end), self.idle_timeout
+        )
+        self.buffer[self.end : self.end + len(data)] = data
+        return self.record_received(len(data))
+
+    async def read_line(self):
+        search_from = self.start
+        while True:
+            newline = self.buffer.find(b"\n", search_from, self.end)
+            if newline != -1:
+                line = bytes(self.buffer[self.start : newline])
+                self.start = newline + 1
+                self.prev_newline = True
+                return line.decode("utf-8", errors="replace").rstrip("\r")
+            if self.eof:
+                if self.start == self.end:
+                    return None
+                line = bytes(self.buffer[self.start : self.end])
+                self.start = self.end
+                return line.decode("utf-8", errors="replace")
+            search_from = self.end - self.start
+            await self.fill()
+            search_from = self.start + search_from
+
+    async def chunks(self):
+        while True:
+            marker, partial = self.find_marker()
+            if marker is not None:
+                stop, done = marker, True
+                self.marker_seen = True
+            elif self.eof:
+                stop, done = self.end, True
+            else:
+                stop, done = self.end - len(END_MARKER) - 1, False
+                if partial is not None:
+                    stop = min(stop, partial)
+            for chunk in self.consume(stop):
+                yield chunk
+            if done:
+                return
+            await self.fill()
+
+    async def spool(self, path):
+        loop = asyncio.get_running_loop()
+        handle = await loop.run_in_executor(None, open, path, "wb")
+        written = 0
+        try:
+            async for chunk in self.chunks():
+                written += await loop.run_in_executor(None, handle.write, chunk)
+        finally:
+            await loop.run_in_executor(None, handle.close)
+        return written
+
+
+async def hand_off(chunks, item, consumer):
+    put = asyncio.ensure_future(chunks.put(item))
+    await asyncio.wait({put, consumer}, return_when=asyncio.FIRST_COMPLETED)
+    if put.done():
+        return True
+    put.cancel()
+    return False
+
+
+class IngestServer:
+    def __init__(
+        self,
+        host,
+        port,
+        backlog=INGEST_BACKLOG,
+        max_connections=INGEST_MAX_CONNECTIONS,
+        idle_timeout=INGEST_IDLE_TIMEOUT,
+    ):
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.active = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.stream_executor = ThreadPoolExecutor(
+            max_workers=max(1, INGEST_STREAM_WORKERS), thread_name_prefix="ingest-stream"
+        )
+        self.enqueue_executor = ThreadPoolExecutor(
+            max_workers=max(1, INGEST_ENQUEUE_WORKERS), thread_name_prefix="ingest-enqueue"
+        )
+
+    async def stream(self, receiver, job):
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(maxsize=max(1, INGEST_STREAM_QUEUE))
+
+        def received():
+            while True:
+                chunk = asyncio.run_coroutine_threadsafe(chunks.get(), loop).result()
+                if chunk is None:
+                    return
+                if chunk is STREAM_INTERRUPTED:
+                    raise ConnectionError("upload interrupted before the end marker")
+                yield chunk
+
+        conversion = loop.run_in_executor(
+            self.stream_executor, stream_job, decode_lines(received()), job
+        )
+        completed = False
+        try:
+            async for chunk in receiver.chunks():
+                if not await hand_off(chunks, bytes(chunk), conversion):
+                    break
+            else:
+                completed = receiver.marker_seen
+        finally:
+            if not conversion.done():
+                await hand_off(chunks, None if completed else STREAM_INTERRUPTED, conversion)
+        return await conversion
+
+    async def handle(self, reader, writer):
+        addr = writer.get_extra_info("peername")
+        if self.active >= self.max_connections:
+            self.rejected += 1
+            print(f"Rejected connection from {addr}: {self.active} uploads already active")
+            writer.close()
+            return
+        self.active += 1
+        self.accepted += 1
+        print(f"Connection from {addr} ({self.active} active)")
+        job = None
+        csv_path = None
+        try:
+            receiver = AsyncSocketReceiver(reader, self.idle_timeout)
+            header_line = await receiver.read_line()
+            if header_line is None:
+                print("Stoped iteration")
+                return
+            header = parse_header(header_line)
+            if header is None:
+                return
+            job = build_job(header)
+            if job is None:
+                return
+            if job["pipeline"] == "stream":
+                await self.stream(receiver, job)
+                return
+            csv_path = job["csv_path"]
+            print(f"Receiving CSV file for {job['filename']} -> {csv_path}")
+            received = await receiver.spool(csv_path)
+            if not receiver.marker_seen:
+                raise ConnectionError("upload closed before the end marker")
+            print(f"Received CSV file ({received} bytes), queued for processing")
+            await asyncio.get_running_loop().run_in_executor(
+                self.enqueue_executor, enqueue_job, job
+            )
+            csv_path = None
+        except asyncio.TimeoutError:
+            print(f"Closing idle connection from {addr} after {self.idle_timeout}s")
+            if csv_path is not None:
+                report_ingest_failure(job)
+        except ConnectionError as exc:
+            print(f"Connection from {addr} lost: {exc}")
+            if csv_path is not None:
+                report_ingest_failure(job)
+        except Exception as exc:
+            request_id = job.get("request_id") if job else None
+            print(f"Failed ingesting request {request_id} from {addr}: {exc}")
+            if job is not None:
+                report_ingest_failure(job)
+        finally:
+            self.active -= 1
+            if csv_path is not None and os.path.exists(csv_path):
+                os.remove(csv_path)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self):
+        server = await asyncio.start_server(
+            self.handle,
+            self.host,
+            self.port,
+            backlog=self.backlog,
+            reuse_address=True,
+        )
+        print(
+            f"Socket server listening on {self.host}:{self.port} "
+            f"(asyncio, backlog {self.backlog}, max {self.max_connections} connections)"
+        )
+        async with server:
+            await server.serve_forever()
+
+
+def run_ingest_server(host, port):
+    try:
+        asyncio.run(IngestServer(host, port).serve())
+    except KeyboardInterrupt:
+        print("Socket server closed")
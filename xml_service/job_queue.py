@@ -0,0 +1,176 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from db_connection import bootstrap_schema, pooled_connection
+
+
+JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", "30"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+CLAIM_SQL = """
+UPDATE xml_jobs
+SET status = 'running',
+    attempts = attempts + 1,
+    locked_by = %(worker)s,
+    locked_until = NOW() + %(timeout)s * INTERVAL '1 second',
+    updated_at = NOW()
+WHERE id = (
+    SELECT id
+    FROM xml_jobs
+    WHERE status = 'queued' AND available_at <= NOW()
+    ORDER BY priority DESC, available_at, id
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING id, payload, attempts
+"""
+
+REQUEUE_EXPIRED_SQL = """
+UPDATE xml_jobs
+SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+    available_at = NOW(),
+    locked_by = NULL,
+    locked_until = NULL,
+    last_error = 'visibility timeout expired',
+    updated_at = NOW()
+WHERE id IN (
+    SELECT id
+    FROM xml_jobs
+    WHERE status = 'running' AND locked_until < NOW()
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING id, status, payload
+"""
+
+
+def load_payload(payload):
+    if isinstance(payload, str):
+        return json.loads(payload)
+    return payload
+
+
+class PostgresJobQueue:
+    def __init__(
+        self,
+        visibility_timeout=JOB_VISIBILITY_TIMEOUT,
+        max_attempts=JOB_MAX_ATTEMPTS,
+        retry_delay=JOB_RETRY_DELAY,
+        on_failed=None,
+    ):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.on_failed = on_failed
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+
+    def execute(self, sql, params=None, fetch=None):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                if fetch == "one":
+                    return cur.fetchone()
+                if fetch == "all":
+                    return cur.fetchall()
+                return cur.rowcount
+
+    def setup(self):
+        bootstrap_schema()
+
+    def enqueue(self, job, priority=0):
+        row = self.execute(
+            "INSERT INTO xml_jobs (request_id, payload, priority, max_attempts) "
+            "VALUES (%s, %s, %s, %s) RETURNING id",
+            (job.get("request_id"), json.dumps(job), priority, self.max_attempts),
+            fetch="one",
+        )
+        return row[0]
+
+    def claim(self):
+        row = self.execute(
+            CLAIM_SQL,
+            {"worker": self.worker_id, "timeout": self.visibility_timeout},
+            fetch="one",
+        )
+        if row is None:
+            return None
+        job_id, payload, attempts = row
+        return job_id, load_payload(payload), attempts
+
+    def complete(self, job_id):
+        self.execute(
+            "UPDATE xml_jobs SET status = 'done', locked_by = NULL, locked_until = NULL, "
+            "updated_at = NOW() WHERE id = %s AND locked_by = %s",
+            (job_id, self.worker_id),
+        )
+
+    def fail(self, job_id, error):
+        row = self.execute(
+            "UPDATE xml_jobs SET "
+            "status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+            "available_at = NOW() + attempts * %s * INTERVAL '1 second', "
+            "locked_by = NULL, locked_until = NULL, last_error = %s, updated_at = NOW() "
+            "WHERE id = %s AND locked_by = %s RETURNING status",
+            (self.retry_delay, str(error)[:2000], job_id, self.worker_id),
+            fetch="one",
+        )
+        return row is not None and row[0] == "failed"
+
+    def extend_leases(self):
+        return self.execute(
+            "UPDATE xml_jobs SET locked_until = NOW() + %s * INTERVAL '1 second' "
+            "WHERE status = 'running' AND locked_by = %s",
+            (self.visibility_timeout, self.worker_id),
+        )
+
+    def requeue_expired(self):
+        return self.execute(REQUEUE_EXPIRED_SQL, fetch="all")
+
+    def report_expired(self, expired):
+        failed = [(job_id, payload) for job_id, status, payload in expired if status == "failed"]
+        requeued = len(expired) - len(failed)
+        if requeued:
+            print(f"Requeued {requeued} jobs with expired visibility timeout")
+        for job_id, payload in failed:
+            print(f"Job {job_id} failed: visibility timeout expired on its last attempt")
+            if self.on_failed is not None:
+                self.on_failed(load_payload(payload))
+
+    def purge_finished(self, retention_days=JOB_RETENTION_DAYS):
+        return self.execute(
+            "DELETE FROM xml_jobs WHERE status IN ('done', 'failed') "
+            "AND updated_at < NOW() - %s * INTERVAL '1 day'",
+            (retention_days,),
+        )
+
+    def counts(self):
+        rows = self.execute(
+            "SELECT status, COUNT(*) FROM xml_jobs "
+            "WHERE status IN ('queued', 'running') GROUP BY status",
+            fetch="all",
+        )
+        counts = {"queued": 0, "running": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def maintain(self):
+        interval = max(1.0, self.visibility_timeout / 3)
+        while True:
+            try:
+                self.extend_leases()
+                self.report_expired(self.requeue_expired())
+                self.purge_finished()
+            except Exception as exc:
+                print(f"Job queue maintenance failed: {exc}")
+            time.sleep(interval)
+
+    def start_maintenance(self):
+        thread = threading.Thread(target=self.maintain, daemon=True)
+        thread.start()
+        return thread
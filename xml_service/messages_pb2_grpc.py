@@ -36,7 +36,12 @@ class BookServiceStub(object):
         """
         self.ListBooks = channel.unary_unary(
                 '/messages.BookService/ListBooks',
-                request_serializer=messages__pb2.Empty.SerializeToString,
+                request_serializer=messages__pb2.ListBooksRequest.SerializeToString,
+                response_deserializer=messages__pb2.BookList.FromString,
+                _registered_method=True)
+        self.StreamBooks = channel.unary_stream(
+                '/messages.BookService/StreamBooks',
+                request_serializer=messages__pb2.ListBooksRequest.SerializeToString,
                 response_deserializer=messages__pb2.BookList.FromString,
                 _registered_method=True)
         self.SearchBooksByName = channel.unary_unary(
@@ -65,6 +70,12 @@ class BookServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamBooks(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def SearchBooksByName(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -88,7 +99,12 @@ def add_BookServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
             'ListBooks': grpc.unary_unary_rpc_method_handler(
                     servicer.ListBooks,
-                    request_deserializer=messages__pb2.Empty.FromString,
+                    request_deserializer=messages__pb2.ListBooksRequest.FromString,
+                    response_serializer=messages__pb2.BookList.SerializeToString,
+            ),
+            'StreamBooks': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamBooks,
+                    request_deserializer=messages__pb2.ListBooksRequest.FromString,
                     response_serializer=messages__pb2.BookList.SerializeToString,
             ),
             'SearchBooksByName': grpc.unary_unary_rpc_method_handler(
@@ -132,7 +148,34 @@ class BookService(object):
             request,
             target,
             '/messages.BookService/ListBooks',
-            messages__pb2.Empty.SerializeToString,
+            messages__pb2.ListBooksRequest.SerializeToString,
+            messages__pb2.BookList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StreamBooks(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/messages.BookService/StreamBooks',
+            messages__pb2.ListBooksRequest.SerializeToString,
             messages__pb2.BookList.FromString,
             options,
             channel_credentials,
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from db_connection import connect, ensure_schema, insert_xml_document, insert_xml_file
+
+
+ITEM = (
+    "  <book>\n"
+    "    <title>Benchmark &amp; Book</title>\n"
+    "    <authors>Persist Bench</authors>\n"
+    "    <description>{filler}</description>\n"
+    "  </book>\n"
+)
+MODES = ("insert", "copy")
+
+
+def write_document(path, size_mb):
+    target = size_mb * 1024 * 1024
+    item = ITEM.format(filler="x" * 900)
+    written = 0
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        written += handle.write('<?xml version="1.0" encoding="UTF-8"?>\n<books>\n')
+        while written < target:
+            written += handle.write(item)
+        handle.write("</books>\n")
+    return os.path.getsize(path)
+
+
+def measure(mode, xml_path):
+    with connect() as conn:
+        ensure_schema(conn)
+        baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        if mode == "insert":
+            with open(xml_path, "r", encoding="utf-8") as handle:
+                xml_text = handle.read()
+            insert_xml_document(conn, xml_text, "bench", publish=False)
+            del xml_text
+        else:
+            insert_xml_file(conn, xml_path, "bench", publish=False)
+        elapsed = time.perf_counter() - started
+        conn.rollback()
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "mode": mode,
+        "seconds": round(elapsed, 3),
+        "baseline_rss_kb": baseline_kb,
+        "peak_rss_kb": peak_kb,
+        "growth_kb": peak_kb - baseline_kb,
+    }
+
+
+def run(sizes, modes):
+    results = []
+    work_dir = tempfile.mkdtemp()
+    for size_mb in sizes:
+        xml_path = os.path.join(work_dir, f"bench_{size_mb}mb.xml")
+        doc_bytes = write_document(xml_path, size_mb)
+        for mode in modes:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "measure", mode, xml_path],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            result["doc_bytes"] = doc_bytes
+            results.append(result)
+            print(
+                f"{size_mb:>6} MB  {mode:<6}  peak {result['peak_rss_kb'] / 1024:8.1f} MiB"
+                f"  (+{result['growth_kb'] / 1024:.1f} MiB)  {result['seconds']:.2f}s"
+            )
+        os.remove(xml_path)
+    os.rmdir(work_dir)
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Compare peak RSS of XML persistence paths against document size"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[8, 32, 128])
+    run_parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    run_parser.add_argument("--json", dest="json_path")
+
+    measure_parser = commands.add_parser("measure")
+    measure_parser.add_argument("mode", choices=MODES)
+    measure_parser.add_argument("xml_path")
+
+    args = parser.parse_args(argv)
+    if args.command == "measure":
+        print(json.dumps(measure(args.mode, args.xml_path)))
+        return 0
+    results = run(args.sizes, args.modes)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
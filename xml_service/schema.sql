@@ -1,6 +1,56 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
 CREATE TABLE IF NOT EXISTS scrapdocs (
     id SERIAL PRIMARY KEY,
     doc XML NOT NULL,
     created_at TIMESTAMP NOT NULL DEFAULT NOW(),
     mapper_version TEXT
 );
+
+CREATE TABLE IF NOT EXISTS xml_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    request_id TEXT,
+    payload JSONB NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    available_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    locked_by TEXT,
+    locked_until TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS xml_jobs_claim_idx
+    ON xml_jobs (priority DESC, available_at, id)
+    WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS xml_jobs_lease_idx
+    ON xml_jobs (locked_until)
+    WHERE status = 'running';
+
+CREATE TABLE IF NOT EXISTS books (
+    doc_id INTEGER NOT NULL REFERENCES scrapdocs (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    title TEXT,
+    authors TEXT,
+    publisher TEXT,
+    language TEXT,
+    isbn_10 TEXT,
+    isbn_13 TEXT,
+    description TEXT,
+    small_thumbnail TEXT,
+    thumbnail TEXT,
+    title_search TEXT NOT NULL DEFAULT '',
+    authors_search TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (doc_id, position)
+);
+
+CREATE INDEX IF NOT EXISTS books_title_search_idx
+    ON books USING gin (title_search gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS books_authors_search_idx
+    ON books USING gin (authors_search gin_trgm_ops);
@@ -0,0 +1,107 @@
+import os
+import select
+import threading
+import time
+from array import array
+from bisect import bisect_right
+
+from psycopg2 import sql
+
+from db_connection import SNAPSHOT_CHANNEL, connect, pooled_connection
+
+
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "30"))
+
+
+class Snapshot:
+    def __init__(self, doc_id, positions, listed, author_list):
+        self.doc_id = doc_id
+        self.positions = array("I", positions)
+        self.listed = listed
+        self.book_list = b"".join(listed)
+        self.author_list = author_list
+
+    def __len__(self):
+        return len(self.listed)
+
+    def page(self, after, size):
+        start = bisect_right(self.positions, after)
+        stop = min(start + size, len(self.listed))
+        if start >= stop:
+            return b"", None, False
+        return b"".join(self.listed[start:stop]), self.positions[stop - 1], stop < len(self.listed)
+
+
+class SnapshotCache:
+    def __init__(self, loader, poll_seconds=SNAPSHOT_POLL_SECONDS, channel=SNAPSHOT_CHANNEL):
+        self.loader = loader
+        self.poll_seconds = poll_seconds
+        self.channel = channel
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    def current(self):
+        return self.snapshot
+
+    def latest_id(self):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT MAX(id) FROM scrapdocs")
+                return cur.fetchone()[0]
+
+    def refresh(self):
+        with self.lock:
+            doc_id = self.latest_id()
+            if self.snapshot is not None and self.snapshot.doc_id == doc_id:
+                return False
+            started = time.perf_counter()
+            with pooled_connection() as conn:
+                snapshot = self.loader(conn, doc_id)
+            self.snapshot = snapshot
+        print(
+            f"Snapshot cache loaded document {doc_id} ({len(snapshot)} books) "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return True
+
+    def listen(self):
+        conn = connect()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+        return conn
+
+    def wait(self, conn):
+        if conn is None:
+            time.sleep(self.poll_seconds)
+            return
+        ready, _, _ = select.select([conn], [], [], self.poll_seconds)
+        if ready:
+            conn.poll()
+            conn.notifies.clear()
+
+    def watch(self):
+        conn = None
+        while True:
+            if conn is None:
+                try:
+                    conn = self.listen()
+                except Exception as exc:
+                    print(f"Snapshot LISTEN unavailable, polling every {self.poll_seconds}s: {exc}")
+            try:
+                self.refresh()
+                self.wait(conn)
+            except Exception as exc:
+                print(f"Snapshot cache refresh failed: {exc}")
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                    conn = None
+                time.sleep(self.poll_seconds)
+
+    def start(self):
+        thread = threading.Thread(target=self.watch, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,328 @@
+import heapq
+import http.client
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit
+
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "5"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+WEBHOOK_BACKOFF_BASE = float(os.getenv("WEBHOOK_BACKOFF_BASE", "1.0"))
+WEBHOOK_BACKOFF_MAX = float(os.getenv("WEBHOOK_BACKOFF_MAX", "60.0"))
+WEBHOOK_DRAIN_SECONDS = float(os.getenv("WEBHOOK_DRAIN_SECONDS", "10"))
+WEBHOOK_DEAD_LETTER_PATH = os.getenv(
+    "WEBHOOK_DEAD_LETTER_PATH",
+    os.path.join(os.path.dirname(__file__), "webhook_dead_letter.jsonl"),
+)
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class WebhookError(Exception):
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class Notification:
+    def __init__(self, url, payload):
+        self.url = url
+        self.payload = payload
+        self.body = json.dumps(payload).encode("utf-8")
+        self.attempts = 0
+        self.created_at = time.time()
+
+
+def backoff_delay(attempt):
+    delay = min(WEBHOOK_BACKOFF_MAX, WEBHOOK_BACKOFF_BASE * (2 ** max(0, attempt - 1)))
+    return random.uniform(delay / 2, delay)
+
+
+class WebhookDispatcher:
+    def __init__(
+        self,
+        workers=WEBHOOK_WORKERS,
+        timeout=WEBHOOK_TIMEOUT,
+        max_attempts=WEBHOOK_MAX_ATTEMPTS,
+        dead_letter_path=WEBHOOK_DEAD_LETTER_PATH,
+    ):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.dead_letter_path = dead_letter_path
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.ready = deque()
+        self.active = set()
+        self.in_flight = {}
+        self.retries = []
+        self.closed = False
+        self.sequence = itertools.count()
+        self.connections = {}
+        self.connections_lock = threading.Lock()
+        self.dead_letter_lock = threading.Lock()
+        self.stats = {"submitted": 0, "coalesced": 0, "sent": 0, "retried": 0, "dead": 0}
+        self.threads = []
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self.worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, url, payload):
+        notification = Notification(url, payload)
+        with self.condition:
+            self.stats["submitted"] += 1
+            self.enqueue(notification)
+            self.condition.notify()
+
+    def enqueue(self, notification):
+        queue = self.pending.setdefault(notification.url, OrderedDict())
+        key = notification.payload.get("request_id")
+        if key is None:
+            key = ("unkeyed", next(self.sequence))
+        if key in queue:
+            self.stats["coalesced"] += 1
+            del queue[key]
+        queue[key] = notification
+        if notification.url not in self.active and notification.url not in self.ready:
+            self.ready.append(notification.url)
+
+    def promote_retries(self):
+        now = time.monotonic()
+        while self.retries and self.retries[0][0] <= now:
+            _, _, notification = heapq.heappop(self.retries)
+            queue = self.pending.get(notification.url)
+            key = notification.payload.get("request_id")
+            if queue is not None and key is not None and key in queue:
+                continue
+            self.enqueue(notification)
+
+    def next_batch(self):
+        with self.condition:
+            while True:
+                self.promote_retries()
+                if self.ready:
+                    url = self.ready.popleft()
+                    self.active.add(url)
+                    batch = deque(self.pending.pop(url, {}).values())
+                    self.in_flight[url] = batch
+                    return url, batch
+                wait = None
+                if self.retries:
+                    wait = max(0.0, self.retries[0][0] - time.monotonic())
+                self.condition.wait(wait)
+
+    def finish_batch(self, url, batch, deferred):
+        leftovers = []
+        with self.condition:
+            self.active.discard(url)
+            self.in_flight.pop(url, None)
+            if self.closed:
+                leftovers.extend(notification for _, notification in deferred)
+                leftovers.extend(batch)
+            else:
+                now = time.monotonic()
+                deferred.extend(
+                    (now + backoff_delay(notification.attempts + 1), notification)
+                    for notification in batch
+                )
+                for due, notification in deferred:
+                    heapq.heappush(self.retries, (due, next(self.sequence), notification))
+                if self.pending.get(url):
+                    self.ready.append(url)
+            batch.clear()
+            self.condition.notify_all()
+        self.dead_letter_all(leftovers)
+
+    def send_batch(self, batch, deferred):
+        while True:
+            with self.condition:
+                if self.closed or not batch:
+                    return
+                notification = batch[0]
+            due, retryable = None, False
+            try:
+                self.deliver(notification)
+            except WebhookError as exc:
+                due = self.handle_failure(notification, exc)
+                retryable = exc.retryable
+            with self.condition:
+                if not batch or batch[0] is not notification:
+                    return
+                batch.popleft()
+                if due is not None:
+                    deferred.append((due, notification))
+                if retryable:
+                    retry_at = due or time.monotonic()
+                    deferred.extend((retry_at, rest) for rest in batch)
+                    batch.clear()
+
+    def worker(self):
+        while True:
+            url, batch = self.next_batch()
+            deferred = []
+            try:
+                self.send_batch(batch, deferred)
+            except Exception as exc:
+                print(f"Webhook worker failed sending to {url}: {exc}")
+            finally:
+                self.finish_batch(url, batch, deferred)
+
+    def handle_failure(self, notification, exc):
+        notification.attempts += 1
+        if not exc.retryable or notification.attempts >= self.max_attempts:
+            print(
+                f"Failed to send webhook to {notification.url} after "
+                f"{notification.attempts} attempts: {exc}"
+            )
+            self.dead_letter(notification, exc)
+            return None
+        delay = backoff_delay(notification.attempts)
+        print(
+            f"Failed to send webhook to {notification.url}: {exc}; "
+            f"retrying in {delay:.1f}s (attempt {notification.attempts})"
+        )
+        with self.condition:
+            self.stats["retried"] += 1
+        return time.monotonic() + delay
+
+    def deliver(self, notification):
+        try:
+            status = self.post(notification.url, notification.body)
+        except WebhookError:
+            raise
+        except (OSError, http.client.HTTPException) as exc:
+            raise WebhookError(str(exc) or type(exc).__name__) from exc
+        except Exception as exc:
+            raise WebhookError(str(exc) or type(exc).__name__, retryable=False) from exc
+        if 200 <= status < 300:
+            with self.condition:
+                self.stats["sent"] += 1
+            print(f"Webhook sent to {notification.url}")
+            return
+        raise WebhookError(f"HTTP {status}", retryable=status in RETRY_STATUSES)
+
+    def post(self, url, body):
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        conn, reused = self.checkout(origin)
+        while True:
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                conn, reused = self.connect(origin), False
+                continue
+            except BaseException:
+                conn.close()
+                raise
+            break
+        if response.will_close:
+            conn.close()
+        else:
+            self.checkin(origin, conn)
+        return response.status
+
+    def connect(self, origin):
+        scheme, host, port = origin
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        if scheme == "http":
+            return http.client.HTTPConnection(host, port, timeout=self.timeout)
+        raise WebhookError(f"Unsupported webhook scheme: {scheme}", retryable=False)
+
+    def checkout(self, origin):
+        with self.connections_lock:
+            idle = self.connections.get(origin)
+            if idle:
+                return idle.pop(), True
+        return self.connect(origin), False
+
+    def checkin(self, origin, conn):
+        with self.connections_lock:
+            idle = self.connections.setdefault(origin, [])
+            if len(idle) < self.workers:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def dead_letter(self, notification, exc):
+        record = {
+            "url": notification.url,
+            "payload": notification.payload,
+            "attempts": notification.attempts,
+            "error": str(exc),
+            "created_at": notification.created_at,
+            "failed_at": time.time(),
+        }
+        try:
+            with self.dead_letter_lock:
+                with open(self.dead_letter_path, "a", encoding="utf-8") as handle:
+                    handle.write(json.dumps(record) + "\n")
+        except OSError as write_exc:
+            print(f"Failed to write dead letter to {self.dead_letter_path}: {write_exc}")
+            print(f"Dead letter: {json.dumps(record)}")
+        with self.condition:
+            self.stats["dead"] += 1
+
+    def dead_letter_all(self, notifications):
+        if not notifications:
+            return
+        error = WebhookError("dispatcher shut down before delivery", retryable=False)
+        for notification in notifications:
+            self.dead_letter(notification, error)
+        print(f"Moved {len(notifications)} undelivered webhooks to {self.dead_letter_path}")
+
+    def queue_stats(self):
+        with self.condition:
+            stats = dict(self.stats)
+            stats["pending"] = sum(len(queue) for queue in self.pending.values())
+            stats["retrying"] = len(self.retries)
+            stats["active_endpoints"] = len(self.active)
+        return stats
+
+    def drain(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while self.ready or self.active or self.retries or any(self.pending.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining if remaining is not None else 0.5)
+        return True
+
+    def close(self, timeout=WEBHOOK_DRAIN_SECONDS):
+        drained = self.drain(timeout)
+        with self.condition:
+            self.closed = True
+            leftovers = [
+                notification for queue in self.pending.values() for notification in queue.values()
+            ]
+            leftovers.extend(notification for _, _, notification in self.retries)
+            for batch in self.in_flight.values():
+                leftovers.extend(batch)
+                batch.clear()
+            self.pending.clear()
+            self.ready.clear()
+            self.retries.clear()
+        self.dead_letter_all(leftovers)
+        return drained
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+MAPPER_CACHE_SIZE = int(os.getenv("MAPPER_CACHE_SIZE", "32"))
+_MAPPER_CACHE = OrderedDict()
+_MAPPER_CACHE_LOCK = threading.Lock()
+
+ATTRIBUTE = 0
+ELEMENT = 1
+CONTAINER = object()
+LINE_BREAKS = re.compile("\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+PRETTY_PREFIX = "  "
+
+
+class CompiledMapper:
+    def __init__(self, mapper):
+        self.root = mapper["root"]
+        self.item = mapper["item"]
+        self.steps = []
+        self.node_count = 1
+        self.item_text = self.compile(mapper["schema"], 0, 0)
+        self.namespaced = has_namespace(self.item, mapper["schema"])
+        self.templates = {
+            False: self.compile_template(mapper["schema"], False),
+            True: self.compile_template(mapper["schema"], True),
+        }
+
+    def compile(self, mapping, node_index, level):
+        children = []
+        for xml_key, map_value in mapping.items():
+            if xml_key.startswith("@"):
+                self.steps.append((ATTRIBUTE, node_index, xml_key[1:], map_value, None, None))
+                continue
+            child_index = self.node_count
+            self.node_count += 1
+            step_index = len(self.steps)
+            self.steps.append(None)
+            if isinstance(map_value, dict):
+                text = self.compile(map_value, child_index, level + 1)
+                children.append([ELEMENT, node_index, xml_key, CONTAINER, text, None, step_index])
+            else:
+                children.append([ELEMENT, node_index, xml_key, map_value, None, None, step_index])
+
+        child_indent = "\n" + ("  " * (level + 1))
+        for position, child in enumerate(children):
+            is_last = position == len(children) - 1
+            child[5] = ("\n" + ("  " * level)) if is_last else child_indent
+            self.steps[child[6]] = tuple(child[:6])
+        return child_indent if children else None
+
+    def compile_template(self, schema, compact):
+        parts = [] if compact else [PRETTY_PREFIX]
+        self.emit_element(self.item, schema, 0, compact, parts)
+        parts.append("\n")
+        template = []
+        slots = []
+        for part in parts:
+            if isinstance(part, str) and template and isinstance(template[-1], str):
+                template[-1] += part
+                continue
+            if not isinstance(part, str):
+                slots.append((len(template),) + part)
+            template.append(part)
+        return template, slots
+
+    def emit_element(self, tag, mapping, level, compact, parts):
+        parts.append(f"<{tag}")
+        children = []
+        for xml_key, map_value in mapping.items():
+            if xml_key.startswith("@"):
+                parts.append(f' {xml_key[1:]}="')
+                parts.append((ATTRIBUTE, map_value, None, None, None))
+                parts.append('"')
+            else:
+                children.append((xml_key, map_value))
+        if not children:
+            parts.append(" />")
+            return
+        parts.append(">")
+        for xml_key, map_value in children:
+            parts.append(indent(level + 1, compact))
+            if isinstance(map_value, dict):
+                self.emit_element(xml_key, map_value, level + 1, compact, parts)
+            else:
+                parts.append(
+                    (ELEMENT, map_value, f"<{xml_key}>", f"</{xml_key}>", f"<{xml_key} />")
+                )
+        parts.append(indent(level, compact))
+        parts.append(f"</{tag}>")
+
+    def bind(self, fieldnames, compact=False):
+        return RowTemplate(self, fieldnames, compact)
+
+    def render_tree(self, row, compact):
+        item = self.build(row)
+        if compact:
+            for element in item.iter():
+                if len(element):
+                    element.text = None
+                element.tail = None
+            return ET.tostring(item, encoding="unicode") + "\n"
+        item_text = ET.tostring(item, encoding="unicode")
+        return "".join(f"{PRETTY_PREFIX}{line}\n" for line in item_text.splitlines())
+
+    def build(self, row):
+        item = ET.Element(self.item)
+        item.text = self.item_text
+        nodes = [item]
+        for kind, parent, name, source, text, tail in self.steps:
+            if kind == ATTRIBUTE:
+                nodes[parent].set(name, row.get(source, source))
+                continue
+            child = ET.SubElement(nodes[parent], name)
+            child.text = text if source is CONTAINER else row.get(source, source)
+            child.tail = tail
+            nodes.append(child)
+        return item
+
+
+class RowTemplate:
+    def __init__(self, compiled, fieldnames, compact):
+        self.compiled = compiled
+        self.fieldnames = list(fieldnames)
+        self.width = len(self.fieldnames)
+        self.compact = compact
+        columns = {name: index for index, name in enumerate(self.fieldnames)}
+        self.columns = sorted(columns.values())
+        self.unique = len(self.columns) == self.width
+        self.template, slots = compiled.templates[compact]
+        self.slots = [
+            (index, kind, columns.get(source) if isinstance(source, str) else None, source)
+            + tuple(markup)
+            for index, kind, source, *markup in slots
+        ]
+
+    def render(self, values):
+        if len(values) != self.width:
+            values = (values + [None] * self.width)[: self.width]
+        checked = values if self.unique else [values[index] for index in self.columns]
+        if not any(value and value.strip() for value in checked):
+            return None
+        if self.compiled.namespaced:
+            return self.compiled.render_tree(dict(zip(self.fieldnames, values)), self.compact)
+        compact = self.compact
+        parts = self.template.copy()
+        for index, kind, column, source, start, end, empty in self.slots:
+            value = source if column is None else values[column]
+            if kind == ATTRIBUTE:
+                text = escape_attribute(value)
+            elif value:
+                text = escape_text(value)
+            else:
+                parts[index] = empty
+                continue
+            if not compact and not text.isprintable() and LINE_BREAKS.search(text):
+                text = LINE_BREAKS.sub("\n" + PRETTY_PREFIX, text)
+            parts[index] = text if kind == ATTRIBUTE else start + text + end
+        return "".join(parts)
+
+
+def indent(level, compact):
+    if compact:
+        return ""
+    return "\n" + PRETTY_PREFIX + ("  " * level)
+
+
+def has_namespace(tag, mapping):
+    if tag.startswith("{"):
+        return True
+    for xml_key, map_value in mapping.items():
+        if xml_key.lstrip("@").startswith("{"):
+            return True
+        if isinstance(map_value, dict) and has_namespace(xml_key, map_value):
+            return True
+    return False
+
+
+def serialization_error(value):
+    return TypeError(f"cannot serialize {value!r} (type {type(value).__name__})")
+
+
+def escape_text(text):
+    if not isinstance(text, str):
+        raise serialization_error(text)
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def escape_attribute(text):
+    if not isinstance(text, str):
+        raise serialization_error(text)
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    if "\n" in text:
+        text = text.replace("\n", "&#10;")
+    if "\t" in text:
+        text = text.replace("\t", "&#09;")
+    return text
+
+
+def mapper_key(mapper):
+    encoded = json.dumps(mapper, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def get_compiled_mapper(mapper):
+    key = mapper_key(mapper)
+    with _MAPPER_CACHE_LOCK:
+        compiled = _MAPPER_CACHE.get(key)
+        if compiled is not None:
+            _MAPPER_CACHE.move_to_end(key)
+            return compiled
+    compiled = CompiledMapper(mapper)
+    with _MAPPER_CACHE_LOCK:
+        _MAPPER_CACHE[key] = compiled
+        _MAPPER_CACHE.move_to_end(key)
+        while len(_MAPPER_CACHE) > max(1, MAPPER_CACHE_SIZE):
+            _MAPPER_CACHE.popitem(last=False)
+    return compiled
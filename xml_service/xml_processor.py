@@ -1,78 +1,222 @@
+import codecs
 import csv
 import json
+import multiprocessing
 import os
 import queue
 import socket
 import threading
-import urllib.request
-import xml.etree.ElementTree as ET
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import lxml.etree as etree
 
-from db_connection import connect, ensure_schema, insert_xml_document
-
-BUFFER_SIZE = 1024
+from db_connection import insert_xml_file, pooled_connection
+from job_queue import JOB_POLL_SECONDS, PostgresJobQueue
+from webhook_dispatcher import WebhookDispatcher
+from xml_mapper import get_compiled_mapper
+
+BUFFER_SIZE = int(os.getenv("SOCKET_BUFFER_SIZE", str(1024 * 1024)))
+END_MARKER = b"endacabadofinalizadoanimalesco"
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "spool")
+XML_OUTPUT_MODE = os.getenv("XML_OUTPUT_MODE", "pretty")
+XML_WRITE_BUFFER_SIZE = int(os.getenv("XML_WRITE_BUFFER_SIZE", str(1024 * 1024)))
+XML_VALIDATION_MODE = os.getenv("XML_VALIDATION_MODE", "inline")
 BASE_DIR = os.path.dirname(__file__)
+SPOOL_DIR = os.getenv("SPOOL_DIR", BASE_DIR)
 XSD_PATH = os.path.join(BASE_DIR, "books.xsd")
 MAPPER_VERSION = "v2"
-PROCESSING_QUEUE = queue.Queue()
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", "4"))
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", str(os.cpu_count() or 1)))
+QUEUE_MAX_SIZE = int(os.getenv("QUEUE_MAX_SIZE", "100"))
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "memory")
+PROCESSING_QUEUE = queue.Queue(maxsize=QUEUE_MAX_SIZE)
 _WORKER_STARTED = False
 _WORKER_LOCK = threading.Lock()
-
-
-def read_lines(conn):
-    buffer = b""
-    while True:
-        try:
-            chunk = conn.recv(BUFFER_SIZE)
-        except socket.timeout:
-            continue
-        if not chunk:
-            if buffer:
-                yield buffer.decode("utf-8", errors="replace")
+_PROCESS_POOL = None
+_JOB_QUEUE = None
+_WEBHOOK_DISPATCHER = None
+_STATS = {"in_flight": 0, "processed": 0, "failed": 0}
+_STATS_LOCK = threading.Lock()
+_SCHEMA_CACHE = threading.local()
+
+
+class SocketReceiver:
+    def __init__(self, conn, buffer_size=BUFFER_SIZE):
+        self.conn = conn
+        self.buffer = bytearray(max(buffer_size, len(END_MARKER) * 4))
+        self.start = 0
+        self.end = 0
+        self.eof = False
+        self.marker_seen = False
+        self.prev_newline = True
+        self.bytes_received = 0
+
+    def make_room(self):
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif self.end == len(self.buffer) and self.start:
+            remaining = self.end - self.start
+            self.buffer[:remaining] = self.buffer[self.start : self.end]
+            self.start, self.end = 0, remaining
+        if self.end == len(self.buffer):
+            self.buffer.extend(bytes(len(self.buffer)))
+
+    def record_received(self, received):
+        if not received:
+            self.eof = True
+        self.end += received
+        self.bytes_received += received
+        return received
+
+    def fill(self):
+        self.make_room()
+        while True:
+            try:
+                with memoryview(self.buffer) as view:
+                    received = self.conn.recv_into(view[self.end :])
+            except socket.timeout:
+                continue
+            break
+        return self.record_received(received)
+
+    def read_line(self):
+        search_from = self.start
+        while True:
+            newline = self.buffer.find(b"\n", search_from, self.end)
+            if newline != -1:
+                line = bytes(self.buffer[self.start : newline])
+                self.start = newline + 1
+                self.prev_newline = True
+                return line.decode("utf-8", errors="replace").rstrip("\r")
+            if self.eof:
+                if self.start == self.end:
+                    return None
+                line = bytes(self.buffer[self.start : self.end])
+                self.start = self.end
+                return line.decode("utf-8", errors="replace")
+            search_from = self.end - self.start
+            self.fill()
+            search_from = self.start + search_from
+
+    def marker_at(self, index):
+        after = index + len(END_MARKER)
+        if after > self.end:
+            return False if self.eof else None
+        if self.buffer[index:after] != END_MARKER:
+            return False
+        if after == self.end:
+            return True if self.eof else None
+        next_byte = self.buffer[after]
+        if next_byte == 0x0A:
+            return True
+        if next_byte == 0x0D:
+            if after + 1 == self.end:
+                return True if self.eof else None
+            return self.buffer[after + 1] == 0x0A
+        return False
+
+    def find_marker(self):
+        index = self.buffer.find(END_MARKER, self.start, self.end)
+        while index != -1:
+            if index == self.start:
+                at_line_start = self.prev_newline
+            else:
+                at_line_start = self.buffer[index - 1] == 0x0A
+            if at_line_start:
+                match = self.marker_at(index)
+                if match is None:
+                    return None, index
+                if match:
+                    return index, None
+            index = self.buffer.find(END_MARKER, index + 1, self.end)
+        return None, None
+
+    def consume(self, stop):
+        if stop <= self.start:
             return
-        buffer += chunk
-        while b"\n" in buffer:
-            line, buffer = buffer.split(b"\n", 1)
-            text = line.decode("utf-8", errors="replace").rstrip("\r")
-            if text == "endacabadofinalizadoanimalesco":
+        with memoryview(self.buffer) as view:
+            with view[self.start : stop] as chunk:
+                self.prev_newline = self.buffer[stop - 1] == 0x0A
+                self.start = stop
+                yield chunk
+
+    def chunks(self):
+        while True:
+            marker, partial = self.find_marker()
+            if marker is not None:
+                yield from self.consume(marker)
+                self.marker_seen = True
                 return
-            yield text
-
-
-def apply_mapping(parent, mapping, row):
-    for xml_key, map_value in mapping.items():
-        if xml_key.startswith("@"):
-            attr_name = xml_key[1:]
-            value = row.get(map_value, map_value)
-            parent.set(attr_name, value)
-        elif isinstance(map_value, dict):
-            child = ET.SubElement(parent, xml_key)
-            apply_mapping(child, map_value, row)
-        else:
-            child = ET.SubElement(parent, xml_key)
-            child.text = row.get(map_value, map_value)
-
-
-def indent_xml(elem, level=0):
-    indent = "\n" + ("  " * level)
-    child_indent = "\n" + ("  " * (level + 1))
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = child_indent
-        for child in elem:
-            indent_xml(child, level + 1)
-            if not child.tail or not child.tail.strip():
-                child.tail = child_indent
-        if not elem[-1].tail or not elem[-1].tail.strip():
-            elem[-1].tail = indent
-    else:
-        if level and (not elem.tail or not elem.tail.strip()):
-            elem.tail = indent
+            if self.eof:
+                yield from self.consume(self.end)
+                return
+            safe_end = self.end - len(END_MARKER) - 1
+            if partial is not None:
+                safe_end = min(safe_end, partial)
+            yield from self.consume(safe_end)
+            self.fill()
+
+    def spool(self, handle):
+        written = 0
+        for chunk in self.chunks():
+            handle.write(chunk)
+            written += len(chunk)
+        return written
+
+    def lines(self):
+        return decode_lines(self.chunks())
+
+
+def decode_lines(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    for chunk in chunks:
+        parts = (pending + decoder.decode(chunk)).split("\n")
+        pending = parts.pop()
+        for part in parts:
+            yield part + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def load_schema():
+    stat = os.stat(XSD_PATH)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    if getattr(_SCHEMA_CACHE, "stamp", None) != stamp:
+        _SCHEMA_CACHE.schema = etree.XMLSchema(etree.parse(XSD_PATH))
+        _SCHEMA_CACHE.stamp = stamp
+        print(f"Loaded XML schema from {XSD_PATH}")
+    return _SCHEMA_CACHE.schema
+
+
+class StreamValidator:
+    def __init__(self, schema=None):
+        self.parser = etree.XMLPullParser(events=("end",), schema=schema or load_schema())
+        self.error = None
+
+    def feed(self, text):
+        if self.error is not None:
+            return
+        try:
+            self.parser.feed(text)
+            for _, elem in self.parser.read_events():
+                elem.clear()
+        except etree.XMLSyntaxError as exc:
+            self.error = str(exc)
+
+    def close(self):
+        if self.error is None:
+            try:
+                self.parser.close()
+            except etree.XMLSyntaxError as exc:
+                self.error = str(exc)
+        return self.error is None, self.error or ""
 
 
 def validate_xml(xml_path):
-    schema_doc = etree.parse(XSD_PATH)
-    schema = etree.XMLSchema(schema_doc)
+    schema = load_schema()
     try:
         for _, elem in etree.iterparse(xml_path, events=("end",), schema=schema):
             elem.clear()
@@ -81,23 +225,38 @@ def validate_xml(xml_path):
         return False, str(exc)
 
 
-def stream_csv_to_xml(lines, mapper, output_name):
+def tee_writer(handle, validator):
+    if validator is None:
+        return handle.write
+
+    def write(text):
+        handle.write(text)
+        validator.feed(text)
+
+    return write
+
+
+def stream_csv_to_xml(lines, mapper, output_name, compact=None, validator=None):
+    if compact is None:
+        compact = XML_OUTPUT_MODE == "compact"
+    compiled = get_compiled_mapper(mapper)
     row_count = 0
-    with open(output_name, "w", encoding="utf-8", newline="") as handle:
-        handle.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-        handle.write(f"<{mapper['root']}>\n")
-        reader = csv.DictReader(lines)
-        for row in reader:
-            if not any(value and value.strip() for value in row.values()):
+    with open(
+        output_name, "w", encoding="utf-8", newline="", buffering=XML_WRITE_BUFFER_SIZE
+    ) as handle:
+        write = tee_writer(handle, validator)
+        write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        write(f"<{mapper['root']}>\n")
+        reader = csv.reader(lines)
+        fieldnames = next(reader, None)
+        render = compiled.bind(fieldnames or [], compact).render
+        for values in reader:
+            item_text = render(values)
+            if item_text is None:
                 continue
-            item = ET.Element(mapper["item"])
-            apply_mapping(item, mapper["schema"], row)
-            indent_xml(item, level=0)
-            item_text = ET.tostring(item, encoding="unicode")
-            for line in item_text.splitlines():
-                handle.write(f"  {line}\n")
+            write(item_text)
             row_count += 1
-        handle.write(f"</{mapper['root']}>\n")
+        write(f"</{mapper['root']}>\n")
     return row_count
 
 
@@ -121,66 +280,134 @@ def build_csv_path(filename, request_id):
     if request_id:
         safe_request_id = str(request_id).replace(os.path.sep, "_")
         base_name = f"{stem}_{safe_request_id}{ext}"
-    path = os.path.join(BASE_DIR, base_name)
+    path = os.path.join(SPOOL_DIR, base_name)
     return ensure_unique_path(path)
 
 
-def receive_csv_file(lines, csv_path):
-    line_count = 0
-    with open(csv_path, "w", encoding="utf-8", newline="") as handle:
-        for line in lines:
-            handle.write(line)
-            handle.write("\n")
-            line_count += 1
-    return line_count
+def receive_csv_file(receiver, csv_path):
+    with open(csv_path, "wb") as handle:
+        return receiver.spool(handle)
+
+
+def get_webhook_dispatcher():
+    global _WEBHOOK_DISPATCHER
+    with _WORKER_LOCK:
+        if _WEBHOOK_DISPATCHER is None:
+            _WEBHOOK_DISPATCHER = WebhookDispatcher()
+        return _WEBHOOK_DISPATCHER
+
+
+def shutdown_webhooks():
+    with _WORKER_LOCK:
+        dispatcher = _WEBHOOK_DISPATCHER
+    if dispatcher is not None:
+        dispatcher.close()
 
 
 def send_webhook(webhook_url, payload):
     if not webhook_url:
         return
-    data = json.dumps(payload).encode("utf-8")
-    request = urllib.request.Request(
-        webhook_url,
-        data=data,
-        headers={"Content-Type": "application/json"},
-        method="POST",
+    get_webhook_dispatcher().submit(webhook_url, payload)
+
+
+def run_cpu_stages(job):
+    output_name = job["output_name"]
+    if job.get("xml_ready"):
+        if job.get("validation") is not None:
+            is_valid, message = job["validation"]
+        else:
+            is_valid, message = validate_xml(output_name)
+        return None, is_valid, message
+
+    validator = None
+    if job.get("validation_mode", XML_VALIDATION_MODE) == "inline":
+        validator = StreamValidator()
+    with open(job["csv_path"], "r", encoding="utf-8", errors="replace", newline="") as handle:
+        row_count = stream_csv_to_xml(
+            handle, job["mapper"], output_name, compact=job.get("compact"), validator=validator
+        )
+    if validator is not None:
+        is_valid, message = validator.close()
+    else:
+        is_valid, message = validate_xml(output_name)
+    return row_count, is_valid, message
+
+
+def build_process_pool():
+    return ProcessPoolExecutor(
+        max_workers=PROCESS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
     )
+
+
+def run_in_process_pool(job):
+    global _PROCESS_POOL
+    pool = _PROCESS_POOL
     try:
-        with urllib.request.urlopen(request, timeout=5) as response:
-            response.read()
-        print(f"Webhook sent to {webhook_url}")
-    except Exception as exc:
-        print(f"Failed to send webhook to {webhook_url}: {exc}")
+        return pool.submit(run_cpu_stages, job).result()
+    except BrokenProcessPool:
+        with _WORKER_LOCK:
+            if _PROCESS_POOL is pool:
+                _PROCESS_POOL = build_process_pool()
+        pool.shutdown(wait=False)
+        raise
+
+
+class PersistenceError(RuntimeError):
+    pass
+
+
+def report_failure(job, status):
+    send_webhook(
+        job.get("webhook_url"),
+        {"status": status, "request_id": job.get("request_id"), "row_id": None},
+    )
+
+
+def report_persistence_failure(job):
+    report_failure(job, "ERRO_PERSISTENCIA")
+
+
+def report_ingest_failure(job):
+    report_failure(job, "ERRO_RECEBIMENTO")
+
+
+def report_processing_failure(job):
+    report_failure(job, "ERRO_PROCESSAMENTO")
+
+
+def report_job_failure(job, exc):
+    if isinstance(exc, PersistenceError):
+        report_persistence_failure(job)
+    else:
+        report_processing_failure(job)
 
 
 def process_job(job):
     request_id = job.get("request_id")
-    mapper = job["mapper"]
-    csv_path = job["csv_path"]
+    csv_path = job.get("csv_path")
     output_name = job["output_name"]
     webhook_url = job.get("webhook_url")
 
-    print(f"Processing request {request_id} from {csv_path}")
-    with open(csv_path, "r", encoding="utf-8", newline="") as handle:
-        row_count = stream_csv_to_xml(handle, mapper, output_name)
-    print(f"Processed {row_count} rows -> {output_name}")
-    print("XML generation complete")
-    is_valid, message = validate_xml(output_name)
+    if job.get("xml_ready"):
+        print(f"Processing request {request_id} from streamed {output_name}")
+    else:
+        print(f"Processing request {request_id} from {csv_path}")
+    if _PROCESS_POOL is not None:
+        row_count, is_valid, message = run_in_process_pool(job)
+    else:
+        row_count, is_valid, message = run_cpu_stages(job)
+    if row_count is not None:
+        print(f"Processed {row_count} rows -> {output_name}")
+        print("XML generation complete")
     if is_valid:
         print(f"XML validated against {XSD_PATH}")
         try:
-            with connect() as conn:
-                ensure_schema(conn)
-                with open(output_name, "r", encoding="utf-8") as handle:
-                    xml_text = handle.read()
-                row_id = insert_xml_document(conn, xml_text, MAPPER_VERSION)
+            with pooled_connection() as conn:
+                row_id = insert_xml_file(conn, output_name, MAPPER_VERSION)
         except Exception as exc:
             print(f"Database insertion failed: {exc}")
-            send_webhook(
-                webhook_url,
-                {"status": "ERRO_PERSISTENCIA", "request_id": request_id, "row_id": None},
-            )
-            return
+            raise PersistenceError(str(exc)) from exc
 
         print(f"Inserted XML into database with id {row_id}")
         send_webhook(webhook_url, {"status": "OK", "request_id": request_id, "row_id": row_id})
@@ -191,77 +418,209 @@ def process_job(job):
 
 
 
+def queue_stats():
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    if _JOB_QUEUE is not None:
+        counts = _JOB_QUEUE.counts()
+        stats["queued"] = counts["queued"]
+        stats["running"] = counts["running"]
+    else:
+        stats["queued"] = PROCESSING_QUEUE.qsize()
+        stats["queue_capacity"] = QUEUE_MAX_SIZE
+    stats["workers"] = WORKER_COUNT
+    stats["process_workers"] = PROCESS_WORKERS
+    return stats
+
+
+def update_stats(**changes):
+    with _STATS_LOCK:
+        for key, delta in changes.items():
+            _STATS[key] += delta
+
+
 def queue_worker():
     while True:
         job = PROCESSING_QUEUE.get()
-        queue_size = PROCESSING_QUEUE.qsize()
+        update_stats(in_flight=1)
+        stats = queue_stats()
         print(
-            f"Dequeued request {job.get('request_id')}. Queue size: {queue_size}"
+            f"Dequeued request {job.get('request_id')}. Queue size: {stats['queued']}, "
+            f"in flight: {stats['in_flight']}"
         )
         try:
             process_job(job)
+            update_stats(processed=1)
         except Exception as exc:
+            update_stats(failed=1)
             print(f"Failed processing request {job.get('request_id')}: {exc}")
+            report_job_failure(job, exc)
         finally:
+            update_stats(in_flight=-1)
             PROCESSING_QUEUE.task_done()
 
 
+def durable_queue_worker(job_queue):
+    while True:
+        try:
+            claimed = job_queue.claim()
+        except Exception as exc:
+            print(f"Failed to claim job: {exc}")
+            time.sleep(JOB_POLL_SECONDS)
+            continue
+        if claimed is None:
+            time.sleep(JOB_POLL_SECONDS)
+            continue
+        job_id, job, attempts = claimed
+        update_stats(in_flight=1)
+        print(f"Claimed job {job_id} (request {job.get('request_id')}, attempt {attempts})")
+        try:
+            process_job(job)
+            job_queue.complete(job_id)
+            update_stats(processed=1)
+        except Exception as exc:
+            update_stats(failed=1)
+            print(f"Failed processing job {job_id} (request {job.get('request_id')}): {exc}")
+            try:
+                exhausted = job_queue.fail(job_id, exc)
+            except Exception as fail_exc:
+                print(f"Failed to record failure of job {job_id}: {fail_exc}")
+                continue
+            if exhausted:
+                report_job_failure(job, exc)
+            else:
+                print(f"Job {job_id} will be retried")
+        finally:
+            update_stats(in_flight=-1)
+
+
 def start_worker():
-    global _WORKER_STARTED
+    global _WORKER_STARTED, _PROCESS_POOL, _JOB_QUEUE
     with _WORKER_LOCK:
         if _WORKER_STARTED:
             return
-        worker = threading.Thread(target=queue_worker, daemon=True)
-        worker.start()
+        if PROCESS_WORKERS > 0:
+            _PROCESS_POOL = build_process_pool()
+        if JOB_QUEUE_BACKEND == "postgres":
+            _JOB_QUEUE = PostgresJobQueue(on_failed=report_processing_failure)
+            _JOB_QUEUE.setup()
+            _JOB_QUEUE.start_maintenance()
+            target, args = durable_queue_worker, (_JOB_QUEUE,)
+            print(f"Using durable job queue as worker {_JOB_QUEUE.worker_id}")
+        else:
+            target, args = queue_worker, ()
+        for _ in range(max(1, WORKER_COUNT)):
+            worker = threading.Thread(target=target, args=args, daemon=True)
+            worker.start()
         _WORKER_STARTED = True
 
 
 def enqueue_job(job):
+    priority = job.get("priority", 0)
+    if _JOB_QUEUE is not None:
+        job_id = _JOB_QUEUE.enqueue(job, priority=priority)
+        print(f"Queued request {job.get('request_id')} as job {job_id} (priority {priority})")
+        return
     PROCESSING_QUEUE.put(job)
-    queue_size = PROCESSING_QUEUE.qsize()
-    print(f"Queued request {job.get('request_id')}. Queue size: {queue_size}")
+    stats = queue_stats()
+    print(
+        f"Queued request {job.get('request_id')}. Queue size: {stats['queued']}, "
+        f"in flight: {stats['in_flight']}"
+    )
+
+
+def parse_header(header_line):
+    try:
+        header = json.loads(header_line)
+    except json.JSONDecodeError:
+        header = None
+    if not isinstance(header, dict):
+        print("Invalid header JSON")
+        return None
+    return header
+
+
+def build_job(header):
+    request_id = header.get("request_id")
+    mapper = header.get("mapper")
+    webhook_url = header.get("webhook_url")
+    filename = header.get("filename", "output.csv")
+    try:
+        priority = int(header.get("priority", 0))
+    except (TypeError, ValueError):
+        priority = 0
+
+    print(f"Request {request_id} mapper={mapper} webhook={webhook_url}")
+    print(f"Receiving CSV lines for {filename}")
+
+    if not isinstance(mapper, dict):
+        print("Mapper is missing or invalid")
+        return None
+
+    csv_path = build_csv_path(filename, request_id)
+    return {
+        "request_id": request_id,
+        "mapper": mapper,
+        "filename": filename,
+        "csv_path": csv_path,
+        "output_name": os.path.splitext(csv_path)[0] + ".xml",
+        "webhook_url": webhook_url,
+        "compact": header.get("xml_format", XML_OUTPUT_MODE) == "compact",
+        "validation_mode": header.get("validation", XML_VALIDATION_MODE),
+        "pipeline": header.get("pipeline", PIPELINE_MODE),
+        "priority": priority,
+    }
+
+
+def stream_job(lines, job):
+    request_id = job["request_id"]
+    output_name = ensure_unique_path(job["output_name"])
+    print(f"Streaming CSV for {job['filename']} -> {output_name}")
+    validator = StreamValidator() if job["validation_mode"] == "inline" else None
+    try:
+        row_count = stream_csv_to_xml(
+            lines,
+            job["mapper"],
+            output_name,
+            compact=job["compact"],
+            validator=validator,
+        )
+        print(f"Processed {row_count} rows -> {output_name}, queued for processing")
+        job.update(csv_path=None, output_name=output_name, xml_ready=True)
+        if validator is not None:
+            job["validation"] = validator.close()
+        enqueue_job(job)
+    except Exception as exc:
+        print(f"Failed streaming request {request_id}: {exc}")
+        if os.path.exists(output_name):
+            os.remove(output_name)
+        report_ingest_failure(job)
+        return False
+    return True
 
 
 def handle_client(conn, addr):
     print(f"Connection from {addr}")
     with conn:
         conn.settimeout(1.0)
-        lines = read_lines(conn)
-        try:
-            header_line = next(lines)
-        except StopIteration:
+        receiver = SocketReceiver(conn)
+        header_line = receiver.read_line()
+        if header_line is None:
             print("Stoped iteration")
             return
 
-        try:
-            header = json.loads(header_line)
-        except json.JSONDecodeError:
-            print("Invalid header JSON")
+        header = parse_header(header_line)
+        if header is None:
+            return
+        job = build_job(header)
+        if job is None:
             return
 
-        request_id = header.get("request_id")
-        mapper = header.get("mapper")
-        webhook_url = header.get("webhook_url")
-        filename = header.get("filename", "output.csv")
-
-        print(f"Request {request_id} mapper={mapper} webhook={webhook_url}")
-        print(f"Receiving CSV lines for {filename}")
-
-        if not isinstance(mapper, dict):
-            print("Mapper is missing or invalid")
+        if job["pipeline"] == "stream":
+            stream_job(receiver.lines(), job)
             return
 
-        csv_path = build_csv_path(filename, request_id)
-        output_name = os.path.splitext(csv_path)[0] + ".xml"
-        print(f"Receiving CSV file for {filename} -> {csv_path}")
-        receive_csv_file(lines, csv_path)
-        print("Received CSV file, queued for processing")
-        enqueue_job(
-            {
-                "request_id": request_id,
-                "mapper": mapper,
-                "csv_path": csv_path,
-                "output_name": output_name,
-                "webhook_url": webhook_url,
-            }
-        )
+        print(f"Receiving CSV file for {job['filename']} -> {job['csv_path']}")
+        received = receive_csv_file(receiver, job["csv_path"])
+        print(f"Received CSV file ({received} bytes), queued for processing")
+        enqueue_job(job)
@@ -1,26 +1,39 @@
+import base64
+import json
 import os
 import re
+import signal
 import socket
 import threading
-import xml.etree.ElementTree as ET
 from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 import grpc
 
 import messages_pb2
 import messages_pb2_grpc
-from db_connection import connect, ensure_schema
-from xml_processor import handle_client, start_worker
+from db_connection import bootstrap_schema, pooled_connection
+from ingest_server import run_ingest_server
+from snapshot_cache import Snapshot, SnapshotCache
+from xml_processor import handle_client, queue_stats, shutdown_webhooks, start_worker
 
 
 DEFAULT_HOST = "0.0.0.0"
 DEFAULT_PORT = 50051
 DEFAULT_SOCKET_HOST = "0.0.0.0"
 DEFAULT_SOCKET_PORT = 9000  
+DEFAULT_STATUS_PORT = 9100
+GRPC_SHUTDOWN_GRACE = float(os.getenv("GRPC_SHUTDOWN_GRACE", "5"))
+INGEST_SERVER = os.getenv("INGEST_SERVER", "asyncio")
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "50"))
+SNAPSHOT_CACHE = os.getenv("SNAPSHOT_CACHE", "1") == "1"
+SNAPSHOT_FETCH_SIZE = int(os.getenv("SNAPSHOT_FETCH_SIZE", "2000"))
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "100"))
+LIST_MAX_PAGE_SIZE = int(os.getenv("LIST_MAX_PAGE_SIZE", "1000"))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "100"))
 
 
-BOOKS_QUERY = """
-SELECT
+BOOK_COLUMNS = """
   b.title,
   b.authors,
   b.publisher,
@@ -30,56 +43,70 @@ SELECT
   b.description,
   b.small_thumbnail,
   b.thumbnail
-FROM scrapdocs s
-CROSS JOIN LATERAL XMLTABLE(
-  %s
-  PASSING s.doc
-  COLUMNS
-    book_xml xml PATH '.',
-    title text PATH 'title',
-    authors text PATH 'authors',
-    publisher text PATH 'publisher',
-    language text PATH 'language',
-    isbn_10 text PATH 'ISBN/isbn_10',
-    isbn_13 text PATH 'ISBN/isbn_13',
-    description text PATH 'description',
-    small_thumbnail text PATH 'thumbnails/smallThumbnail',
-    thumbnail text PATH 'thumbnails/thumbnail'
-) AS b
-WHERE s.id = (SELECT MAX(id) FROM scrapdocs);
 """
 
-AUTHORS_QUERY = """
-SELECT
-  unnest(xpath('/books/book/authors/text()', s.doc))::text AS author
-FROM scrapdocs s
-WHERE s.id = (SELECT MAX(id) FROM scrapdocs);
+LATEST_SNAPSHOT = "b.doc_id = (SELECT MAX(id) FROM scrapdocs)"
+
+BOOKS_QUERY = f"""
+SELECT {BOOK_COLUMNS}
+FROM books b
+WHERE {LATEST_SNAPSHOT}
+ORDER BY b.position;
 """
 
-BOOKS_BY_AUTHOR_QUERY = """
-SELECT
-  unnest(
-    xpath(
-      '/books/book[contains(authors, "' || %s || '")]',
-      s.doc
-    )
-  )::text AS book_xml
-FROM scrapdocs s
-WHERE s.id = (SELECT MAX(id) FROM scrapdocs);
+LATEST_DOC_QUERY = "SELECT MAX(id) FROM scrapdocs;"
+
+SNAPSHOT_BOOKS_QUERY = f"""
+SELECT b.position, {BOOK_COLUMNS}
+FROM books b
+WHERE b.doc_id = %s AND b.position > %s
+ORDER BY b.position;
 """
 
-BOOKS_BY_TITLE_QUERY = """
-SELECT
-  unnest(
-    xpath(
-      '/books/book[contains(title, "' || %s || '")]',
-      s.doc
-    )
-  )::text AS book_xml
-FROM scrapdocs s
-WHERE s.id = (SELECT MAX(id) FROM scrapdocs);
+BOOKS_PAGE_QUERY = f"""
+SELECT b.position, {BOOK_COLUMNS}
+FROM books b
+WHERE b.doc_id = %s AND b.position > %s
+ORDER BY b.position
+LIMIT %s;
 """
 
+AUTHORS_QUERY = f"""
+SELECT b.authors
+FROM books b
+WHERE {LATEST_SNAPSHOT} AND b.authors IS NOT NULL
+ORDER BY b.position;
+"""
+
+SEARCH_QUERY = """
+SELECT {columns}
+FROM books b
+WHERE {latest}
+  AND (
+    b.{field} LIKE lower(unaccent(%(pattern)s))
+    OR lower(unaccent(%(term)s)) <%% b.{field}
+  )
+ORDER BY
+  b.{field} LIKE lower(unaccent(%(pattern)s)) DESC,
+  word_similarity(lower(unaccent(%(term)s)), b.{field}) DESC,
+  b.position
+LIMIT %(limit)s;
+"""
+
+BOOKS_BY_AUTHOR_QUERY = SEARCH_QUERY.format(
+    columns=BOOK_COLUMNS, latest=LATEST_SNAPSHOT, field="authors_search"
+)
+
+BOOKS_BY_TITLE_QUERY = SEARCH_QUERY.format(
+    columns=BOOK_COLUMNS, latest=LATEST_SNAPSHOT, field="title_search"
+)
+
+
+def search_params(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return {"term": term, "pattern": f"%{escaped}%", "limit": SEARCH_LIMIT}
+
+
 def split_authors(text):
     if not text:
         return []
@@ -87,25 +114,21 @@ def split_authors(text):
     return [part.strip() for part in parts if part.strip()]
 
 
-def parse_book_xml(book_xml, context):
-    if book_xml is None:
-        return messages_pb2.Book()
-    try:
-        root = ET.fromstring(str(book_xml))
-    except ET.ParseError as exc:
-        context.abort(grpc.StatusCode.INTERNAL, f"Invalid book XML: {exc}")
-    title = (root.findtext("title") or "").strip()
-    authors_text = (root.findtext("authors") or "").strip()
-    publisher = (root.findtext("publisher") or "").strip()
-    language = (root.findtext("language") or "").strip()
-    description = (root.findtext("description") or "").strip()
-    isbn_10 = (root.findtext("ISBN/isbn_10") or root.findtext("isbn_10") or "").strip()
-    isbn_13 = (root.findtext("ISBN/isbn_13") or root.findtext("isbn_13") or "").strip()
-    small_thumbnail = (root.findtext("thumbnails/smallThumbnail") or "").strip()
-    thumbnail = (root.findtext("thumbnails/thumbnail") or "").strip()
+def parse_book_row(row):
+    (
+        title,
+        authors,
+        publisher,
+        language,
+        isbn_10,
+        isbn_13,
+        description,
+        small_thumbnail,
+        thumbnail,
+    ) = (value.strip() if value else "" for value in row)
     return messages_pb2.Book(
         title=title,
-        authors=split_authors(authors_text),
+        authors=split_authors(authors),
         publisher=publisher,
         language=language,
         isbn_10=isbn_10,
@@ -115,59 +138,252 @@ def parse_book_xml(book_xml, context):
         thumbnail=thumbnail,
     )
 
+
+def list_book_row(row):
+    (
+        title,
+        authors,
+        publisher,
+        language,
+        isbn_10,
+        isbn_13,
+        description,
+        small_thumbnail,
+        thumbnail,
+    ) = row
+    return messages_pb2.Book(
+        title=title or "",
+        authors=[authors] if authors else [],
+        publisher=publisher or "",
+        language=language or "",
+        isbn_10=isbn_10 or "",
+        isbn_13=isbn_13 or "",
+        description=description or "",
+        small_thumbnail=small_thumbnail or "",
+        thumbnail=thumbnail or "",
+    )
+
+
+def build_author_list(values):
+    authors = []
+    seen = set()
+    for authors_raw in values:
+        for name in split_authors(authors_raw):
+            key = name.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            authors.append(messages_pb2.Author(name=name))
+    return messages_pb2.AuthorList(authors=authors)
+
+
+def encode_page_token(doc_id, position):
+    return base64.urlsafe_b64encode(f"{doc_id}:{position}".encode("ascii")).decode("ascii")
+
+
+def decode_page_token(token):
+    try:
+        doc_id, position = base64.urlsafe_b64decode(token.encode("ascii")).split(b":")
+        return int(doc_id), int(position)
+    except ValueError:
+        raise ValueError(f"invalid page_token: {token!r}") from None
+
+
+def page_request(request, default_size):
+    if request.page_size < 0:
+        raise ValueError("page_size must not be negative")
+    size = min(request.page_size or default_size, LIST_MAX_PAGE_SIZE)
+    cursor = decode_page_token(request.page_token) if request.page_token else None
+    return size, cursor
+
+
+class SnapshotExpired(LookupError):
+    pass
+
+
+def resolve_cursor(conn, cursor):
+    with conn.cursor() as cur:
+        if cursor is None:
+            cur.execute(LATEST_DOC_QUERY)
+            return cur.fetchone()[0], 0
+        cur.execute("SELECT EXISTS (SELECT 1 FROM books WHERE doc_id = %s);", (cursor[0],))
+        if not cur.fetchone()[0]:
+            raise SnapshotExpired("page_token refers to a snapshot that is no longer retained")
+        return cursor
+
+
+def fetch_book_page(cursor, size):
+    with pooled_connection() as conn:
+        doc_id, after = resolve_cursor(conn, cursor)
+        if doc_id is None:
+            return None, []
+        with conn.cursor() as cur:
+            cur.execute(BOOKS_PAGE_QUERY, (doc_id, after, size + 1))
+            return doc_id, cur.fetchall()
+
+
+def page_token_bytes(doc_id, position):
+    token = encode_page_token(doc_id, position)
+    return messages_pb2.BookList(next_page_token=token).SerializeToString()
+
+
+def book_page(doc_id, rows, size):
+    books = [list_book_row(row[1:]) for row in rows[:size]]
+    next_page_token = ""
+    if len(rows) > size:
+        next_page_token = encode_page_token(doc_id, rows[size - 1][0])
+    return messages_pb2.BookList(books=books, next_page_token=next_page_token)
+
+
+def load_snapshot(conn, doc_id):
+    positions = []
+    listed = []
+    authors = []
+    if doc_id is not None:
+        with conn.cursor(name="snapshot_books") as cur:
+            cur.itersize = SNAPSHOT_FETCH_SIZE
+            cur.execute(SNAPSHOT_BOOKS_QUERY, (doc_id, 0))
+            for position, *row in cur:
+                positions.append(position)
+                listed.append(messages_pb2.BookList(books=[list_book_row(row)]).SerializeToString())
+                authors.append(row[1])
+    author_list = build_author_list(authors)
+    return Snapshot(doc_id, positions, listed, author_list.SerializeToString())
+
+
+def serialize(response):
+    if isinstance(response, bytes):
+        return response
+    return response.SerializeToString()
+
+
+def add_book_service(servicer, server):
+    rpc_method_handlers = {
+        "ListBooks": grpc.unary_unary_rpc_method_handler(
+            servicer.ListBooks,
+            request_deserializer=messages_pb2.ListBooksRequest.FromString,
+            response_serializer=serialize,
+        ),
+        "StreamBooks": grpc.unary_stream_rpc_method_handler(
+            servicer.StreamBooks,
+            request_deserializer=messages_pb2.ListBooksRequest.FromString,
+            response_serializer=serialize,
+        ),
+        "SearchBooksByName": grpc.unary_unary_rpc_method_handler(
+            servicer.SearchBooksByName,
+            request_deserializer=messages_pb2.SearchRequest.FromString,
+            response_serializer=serialize,
+        ),
+        "SearchBooksByAuthor": grpc.unary_unary_rpc_method_handler(
+            servicer.SearchBooksByAuthor,
+            request_deserializer=messages_pb2.SearchRequest.FromString,
+            response_serializer=serialize,
+        ),
+        "ListAuthors": grpc.unary_unary_rpc_method_handler(
+            servicer.ListAuthors,
+            request_deserializer=messages_pb2.Empty.FromString,
+            response_serializer=serialize,
+        ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+        "messages.BookService", rpc_method_handlers
+    )
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
 class BookServiceServicer(messages_pb2_grpc.BookServiceServicer):
+    def __init__(self, cache=None):
+        self.cache = cache
+
+    def cached(self):
+        if self.cache is None:
+            return None
+        return self.cache.current()
+
     def ListBooks(self, request, context):
+        if request.page_size or request.page_token:
+            return self.list_page(request, context)
+        snapshot = self.cached()
+        if snapshot is not None:
+            return snapshot.book_list
         try:
-            with connect() as conn:
-                ensure_schema(conn)
+            with pooled_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute(BOOKS_QUERY, ("/books/book",))
+                    cur.execute(BOOKS_QUERY)
                     rows = cur.fetchall()
         except Exception as exc:
             context.abort(grpc.StatusCode.INTERNAL, str(exc))
 
-        books = []
-        for row in rows:
-            (
-                title,
-                authors,
-                publisher,
-                language,
-                isbn_10,
-                isbn_13,
-                description,
-                small_thumbnail,
-                thumbnail,
-            ) = row
-            books.append(
-                messages_pb2.Book(
-                    title=title or "",
-                    authors=[authors] if authors else [],
-                    publisher=publisher or "",
-                    language=language or "",
-                    isbn_10=isbn_10 or "",
-                    isbn_13=isbn_13 or "",
-                    description=description or "",
-                    small_thumbnail=small_thumbnail or "",
-                    thumbnail=thumbnail or "",
-                )
-            )
+        books = [list_book_row(row) for row in rows]
         return messages_pb2.BookList(books=books)
 
+    def list_page(self, request, context):
+        try:
+            size, cursor = page_request(request, LIST_PAGE_SIZE)
+        except ValueError as exc:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(exc))
+
+        snapshot = self.cached()
+        if snapshot is not None and (cursor is None or cursor[0] == snapshot.doc_id):
+            payload, last, more = snapshot.page(cursor[1] if cursor else 0, size)
+            if more:
+                payload += page_token_bytes(snapshot.doc_id, last)
+            return payload
+        try:
+            doc_id, rows = fetch_book_page(cursor, size)
+        except SnapshotExpired as exc:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, str(exc))
+        except Exception as exc:
+            context.abort(grpc.StatusCode.INTERNAL, str(exc))
+
+        return book_page(doc_id, rows, size)
+
+    def StreamBooks(self, request, context):
+        try:
+            size, cursor = page_request(request, STREAM_BATCH_SIZE)
+        except ValueError as exc:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(exc))
+
+        snapshot = self.cached()
+        if snapshot is not None and (cursor is None or cursor[0] == snapshot.doc_id):
+            after = cursor[1] if cursor else 0
+            while context.is_active():
+                payload, last, more = snapshot.page(after, size)
+                if not more:
+                    if payload:
+                        yield payload
+                    return
+                yield payload + page_token_bytes(snapshot.doc_id, last)
+                after = last
+            return
+        while context.is_active():
+            try:
+                doc_id, rows = fetch_book_page(cursor, size)
+            except SnapshotExpired as exc:
+                context.abort(grpc.StatusCode.FAILED_PRECONDITION, str(exc))
+            except Exception as exc:
+                context.abort(grpc.StatusCode.INTERNAL, str(exc))
+            page = book_page(doc_id, rows, size)
+            if not page.next_page_token:
+                if page.books:
+                    yield page
+                return
+            yield page
+            cursor = (doc_id, rows[size - 1][0])
+
     def SearchBooksByName(self, request, context):
         term = request.query.strip()
         if not term:
             return messages_pb2.BookList()
         try:
-            with connect() as conn:
-                ensure_schema(conn)
+            with pooled_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute(BOOKS_BY_TITLE_QUERY, (term,))
+                    cur.execute(BOOKS_BY_TITLE_QUERY, search_params(term))
                     rows = cur.fetchall()
         except Exception as exc:
             context.abort(grpc.StatusCode.INTERNAL, str(exc))
 
-        books = [parse_book_xml(row[0], context) for row in rows]
+        books = [parse_book_row(row) for row in rows]
         return messages_pb2.BookList(books=books)
 
     def SearchBooksByAuthor(self, request, context):
@@ -175,37 +391,29 @@ class BookServiceServicer(messages_pb2_grpc.BookServiceServicer):
         if not term:
             return messages_pb2.BookList()
         try:
-            with connect() as conn:
-                ensure_schema(conn)
+            with pooled_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute(BOOKS_BY_AUTHOR_QUERY, (term,))
+                    cur.execute(BOOKS_BY_AUTHOR_QUERY, search_params(term))
                     rows = cur.fetchall()
         except Exception as exc:
             context.abort(grpc.StatusCode.INTERNAL, str(exc))
 
-        books = [parse_book_xml(row[0], context) for row in rows]
+        books = [parse_book_row(row) for row in rows]
         return messages_pb2.BookList(books=books)
 
     def ListAuthors(self, request, context):
+        snapshot = self.cached()
+        if snapshot is not None:
+            return snapshot.author_list
         try:
-            with connect() as conn:
-                ensure_schema(conn)
+            with pooled_connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute(AUTHORS_QUERY)
                     rows = cur.fetchall()
         except Exception as exc:
             context.abort(grpc.StatusCode.INTERNAL, str(exc))
 
-        authors = []
-        seen = set()
-        for (authors_raw,) in rows:
-            for name in split_authors(authors_raw):
-                key = name.lower()
-                if key in seen:
-                    continue
-                seen.add(key)
-                authors.append(messages_pb2.Author(name=name))
-        return messages_pb2.AuthorList(authors=authors)
+        return build_author_list(authors_raw for (authors_raw,) in rows)
 
 
 def serve():
@@ -213,16 +421,27 @@ def serve():
     port = int(os.getenv("GRPC_PORT", str(DEFAULT_PORT)))
     address = f"{host}:{port}"
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    messages_pb2_grpc.add_BookServiceServicer_to_server(BookServiceServicer(), server)
+    cache = None
+    if SNAPSHOT_CACHE:
+        cache = SnapshotCache(load_snapshot)
+        cache.start()
+    add_book_service(BookServiceServicer(cache), server)
     server.add_insecure_port(address)
-    print(f"BookService listening on {address} using PostgreSQL")
+    mode = "snapshot cache" if cache is not None else "PostgreSQL"
+    print(f"BookService listening on {address} using {mode}")
     server.start()
-    server.wait_for_termination()
+    try:
+        server.wait_for_termination()
+    finally:
+        server.stop(GRPC_SHUTDOWN_GRACE).wait()
 
 
 def run_socket_server():
     host = os.getenv("SOCKET_HOST", DEFAULT_SOCKET_HOST)
     port = int(os.getenv("SOCKET_PORT", str(DEFAULT_SOCKET_PORT)))
+    if INGEST_SERVER == "asyncio":
+        run_ingest_server(host, port)
+        return
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
         server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         server.bind((host, port))
@@ -243,11 +462,57 @@ def run_socket_server():
             print("Socket server closed")
 
 
+class StatusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/status":
+            self.send_error(404)
+            return
+        try:
+            body = json.dumps(queue_stats()).encode("utf-8")
+        except Exception as exc:
+            self.send_error(503, str(exc))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_status_server():
+    host = os.getenv("STATUS_HOST", DEFAULT_SOCKET_HOST)
+    port = int(os.getenv("STATUS_PORT", str(DEFAULT_STATUS_PORT)))
+    if not port:
+        return
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    print(f"Status endpoint listening on http://{host}:{port}/status")
+    server.serve_forever()
+
+
+def terminate(signum, frame):
+    raise SystemExit(0)
+
+
 def main():
+    try:
+        bootstrap_schema()
+    except Exception as exc:
+        print(f"Schema bootstrap failed, retrying on first use: {exc}")
     start_worker()
     socket_thread = threading.Thread(target=run_socket_server, daemon=True)
     socket_thread.start()
-    serve()
+    status_thread = threading.Thread(target=run_status_server, daemon=True)
+    status_thread.start()
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        serve()
+    except KeyboardInterrupt:
+        print("BookService interrupted")
+    finally:
+        shutdown_webhooks()
 
 
 if __name__ == "__main__":